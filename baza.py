@@ -1,395 +1,1187 @@
-import csv
-from geslo import sifriraj_geslo
-
-class Tabela:
-    """
-    Razred, ki predstavlja tabelo v bazi.
-
-    Polja razreda:
-    - ime: ime tabele
-    - podatki: datoteka s podatki ali None
-    """
-    ime = None
-    podatki = None
-
-    def __init__(self, conn):
-        """
-        Konstruktor razreda.
-        """
-        self.conn = conn
-
-    def ustvari(self):
-        """
-        Metoda za ustvarjanje tabele.
-        Podrazredi morajo povoziti to metodo.
-        """
-        raise NotImplementedError
-
-    def izbrisi(self):
-        """
-        Metoda za brisanje tabele.
-        """
-        self.conn.execute("DROP TABLE IF EXISTS {};".format(self.ime))
-
-
-
-    def uvozi(self, encoding="UTF-8", **kwargs):
-        """
-        Metoda za uvoz podatkov.
-        Argumenti:
-        - encoding: kodiranje znakov
-        - ostali poimenovani argumenti: za metodo dodaj_vrstico
-        """
-        if self.podatki is None:
-            return
-        with open(self.podatki, encoding=encoding) as datoteka:
-            podatki = csv.reader(datoteka)
-            stolpci = self.pretvori(next(podatki), kwargs)
-            poizvedba = self.dodajanje(stolpci)
-            for vrstica in podatki:
-                vrstica = [None if x == "" else x for x in vrstica]
-                self.dodaj_vrstico(vrstica, poizvedba, **kwargs)
-
-    def izprazni(self):
-        """
-        Metodo za praznjenje tabele.
-        """
-        self.conn.execute("DELETE FROM {};".format(self.ime))
-
-    @staticmethod
-    def pretvori(stolpci, kwargs):
-        """
-        Prilagodi imena stolpcev
-        in poskrbi za ustrezne argumente za dodaj_vrstico.
-
-        Privzeto vrne podane stolpce.
-        """
-        return stolpci
-
-    def dodajanje(self, stolpci=None, stevilo=None):
-        """
-        Metoda za gradnjo poizvedbe.
-
-        Arugmenti uporabimo enega od njiju):
-        - stolpci: seznam stolpcev
-        - stevilo: število stolpcev
-        """
-        if stolpci is None:
-            assert stevilo is not None
-            st = ""
-        else:
-            st = " ({})".format(", ".join(stolpci))
-            stevilo = len(stolpci)
-        return "INSERT INTO {}{} VALUES ({})". \
-            format(self.ime, st, ", ".join(["?"] * stevilo))
-
-    def dodaj_vrstico(self, podatki, poizvedba=None, **kwargs):
-        """
-        Metoda za dodajanje vrstice.
-
-        Argumenti:
-        - podatki: seznam s podatki v vrstici
-        - poizvedba: poizvedba, ki naj se zažene
-        - poljubni poimenovani parametri: privzeto se ignorirajo
-        """
-        if poizvedba is None:
-            poizvedba = self.dodajanje(stevilo=len(podatki))
-        cur = self.conn.execute(poizvedba, podatki)
-        return cur.lastrowid
-
-
-class Uporabnik(Tabela):
-    """
-    Tabela za uporabnike.
-    """
-    ime = "uporabnik"
-    podatki = "podatki/uporabnik.csv"
-
-    def ustvari(self):
-        """
-        Ustvari tabelo uporabnik.
-        """
-        self.conn.execute("""
-            CREATE TABLE uporabnik (
-                id        INTEGER PRIMARY KEY AUTOINCREMENT,
-                ime       TEXT NOT NULL UNIQUE,
-                zgostitev TEXT NOT NULL,
-                sol       TEXT NOT NULL
-            )
-        """)
-
-    @staticmethod
-    def pretvori(stolpci, kwargs):
-        """
-        Zapomni si indeksa stolpcev za zgostitev in sol.
-        """
-        kwargs["zgostitev"] = stolpci.index("zgostitev")
-        kwargs["sol"] = stolpci.index("sol")
-        return stolpci
-
-    def dodaj_vrstico(self, podatki, poizvedba=None, zgostitev=None, sol=None):
-        """
-        Dodaj uporabnika.
-        Če sol ni podana, zašifrira podano geslo.
-        """
-        if sol is not None and zgostitev is not None and podatki[sol] is None:
-            podatki[zgostitev], podatki[sol] = sifriraj_geslo(podatki[zgostitev])
-        return super().dodaj_vrstico(podatki, poizvedba)
-
-
-class Cepiva(Tabela):
-    """
-    Tabela za cepiva.
-    """
-    ime = "cepiva"
-    podatki = "podatki/cepiva.csv"
-
-    def ustvari(self):
-        """
-        Ustvari tabelo cepiva.
-        """
-        self.conn.execute("""
-            CREATE TABLE cepiva (
-                id    INTEGER PRIMARY KEY AUTOINCREMENT,
-                naziv TEXT UNIQUE
-            );
-        """)
-
-
-class Prostor(Tabela):
-    """
-    Tabela za prostor.
-    """
-    ime = "prostor"
-    podatki = "podatki/prostor.csv"
-
-    def ustvari(self):
-        """
-        Ustvari tabelo prostor.
-        """
-        self.conn.execute("""
-            CREATE TABLE prostor (
-                id           INTEGER PRIMARY KEY AUTOINCREMENT,
-                oddelek      CHARACTER CHECK (oddelek IN ('M','P')),
-                kapaciteta   INTEGER,
-                zasedenost   INTEGER
-            );
-        """)
-
-
-class Zival(Tabela):
-    """
-    Tabela za zivali.
-    """
-    ime = "zival"
-    podatki = "podatki/zival.csv"
-
-
-    def __init__(self, conn):
-        """
-        Konstruktor tabele.
-
-        Argumenti:
-        - conn: povezava na bazo
-        """
-        super().__init__(conn)
-        #self.oznaka = oznaka
-
-    def ustvari(self):
-        """
-        Ustavari tabelo zival.
-        """
-        self.conn.execute("""
-            CREATE TABLE zival (
-                id         INTEGER PRIMARY KEY,
-                ime        TEXT,
-                spol       CHARACTER CHECK (spol IN ('M','Z')),
-                vrsta      CHARACTER CHECK (vrsta IN ('M','P')),
-                dat_roj    DATE,
-                dat_spr    DATE,
-                bolezni    TEXT
-            );
-        """)
-
-
-    def dodaj_vrstico(self, podatki, poizvedba=None):
-        """
-        Dodaj ZIVAL.
-
-        Argumenti:
-        - podatki: seznam s podatki o zivali
-        - poizvedba: poizvedba za dodajanje zivali
-        """
-        return super().dodaj_vrstico(podatki, poizvedba)
-
-
-class Oseba(Tabela):
-    """
-    Tabela za osebe.
-    """
-    ime = "oseba"
-    podatki = "podatki/oseba.csv"
-   
-
-    def ustvari(self):
-        """
-        Ustvari tabelo oseba.
-        """
-        self.conn.execute("""
-            CREATE TABLE oseba (
-                id       INTEGER PRIMARY KEY,
-                ime      TEXT,
-                priimek  TEXT,
-                mail     TEXT
-            );
-        """)
-   
-    def dodaj_vrstico(self, podatki, poizvedba=None):
-        """
-        Dodaj OSEBO.
-
-        Argumenti:
-        - podatki: seznam s podatki o osebi
-        - poizvedba: poizvedba za dodajanje osebe
-        """
-        return super().dodaj_vrstico(podatki, poizvedba)
-
-
-class Posvojitev(Tabela):
-    """
-    Tabela za posvojitve.
-    """
-    ime = "posvojitev"
-   
-
-    def ustvari(self):
-        """
-        Ustvari tabelo pos.
-        """
-        self.conn.execute("""
-            CREATE TABLE posvojitev (
-                id        INTEGER PRIMARY KEY,
-                id_z      INTEGER,
-                id_o      INTEGER,
-                datum     DATE
-            );
-        """)
-   
-    def dodaj_vrstico(self, podatki, poizvedba=None):
-        """
-        Dodaj POS.
-        """
-        return super().dodaj_vrstico(podatki, poizvedba)
-
-
-class Cepljenja(Tabela):
-    """
-    Tabela za cep.
-    """
-    ime = "cepljenja"
-
-
-    def ustvari(self):
-        """
-        Ustvari tabelo cep.
-        """
-        self.conn.execute("""
-            CREATE TABLE cepljenja (
-                id       INTEGER PRIMARY KEY,
-                id_z     INTEGER,
-                id_c     INTEGER
-            );
-        """)
-   
-    def dodaj_vrstico(self, podatki, poizvedba=None):
-        """
-        Dodaj Cepljenje.
-
-       """
-        return super().dodaj_vrstico(podatki, poizvedba)
-
-class Namestitev(Tabela):
-    """
-    Tabela za namestitev
-    """
-    ime = "namestitev"
-    podatki = "podatki/namestitev.csv"
-
-
-    def ustvari(self):
-        """
-        Ustvari tabelo namestitev.
-        """
-        self.conn.execute("""
-            CREATE TABLE namestitev (
-                id_z INTEGER REFERENCES zival (id),
-                id_p INTEGER REFERENCES prostor (id)
-            );
-        """)
-
-    def dodaj_vrstico(self, podatki, poizvedba=None):
-    
-        return super().dodaj_vrstico(podatki, poizvedba)
-
-def ustvari_tabele(tabele):
-    """
-    Ustvari podane tabele.
-    """
-    for t in tabele:
-        t.ustvari()
-
-
-def izbrisi_tabele(tabele):
-    """
-    Izbriši podane tabele.
-    """
-    for t in tabele:
-        t.izbrisi()
-
-def izprazni_tabele(tabele):
-    """
-    Izprazni podane tabele.
-    """
-    for t in tabele:
-        t.izprazni()
-
-def uvozi_podatke(tabele):
-    """
-    Uvozi podatke v podane tabele.
-    """
-    for t in tabele:
-        t.uvozi()
-
-
-def ustvari_bazo(conn):
-    """
-    Izvede ustvarjanje baze.
-    """
-    tabele = pripravi_tabele(conn)
-    izbrisi_tabele(tabele)
-    ustvari_tabele(tabele)
-    uvozi_podatke(tabele)
-    
-def pripravi_tabele(conn):
-    """
-    Pripravi objekte za tabele.
-    """
-    uporabnik = Uporabnik(conn)
-    cepiva = Cepiva(conn)
-    prostor = Prostor(conn)
-    zival = Zival(conn)
-    oseba = Oseba(conn)
-    posvojitev = Posvojitev(conn)
-    cepljenja = Cepljenja(conn)
-    namestitev = Namestitev(conn)
-    return [uporabnik, cepiva, prostor, zival, oseba, posvojitev, cepljenja, namestitev]
-
-
-def ustvari_bazo_ce_ne_obstaja(conn):
-    """
-    Ustvari bazo, če ta še ne obstaja.
-    """
-    with conn:
-        cur = conn.execute("SELECT COUNT(*) FROM sqlite_master")
-        if cur.fetchone() == (0, ):
-            ustvari_bazo(conn)
\ No newline at end of file
+import csv
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from functools import wraps
+from itertools import islice
+from geslo import sifriraj_geslo
+from pomozne_funkcije import normaliziraj, normaliziraj_datum
+
+PAKET = 1000
+
+# Različica sheme, zapisana v PRAGMA user_version; poveča se ob vsaki
+# spremembi, ki jo mora posodobi_bazo izvesti na obstoječih bazah.
+RAZLICICA = 1
+
+PRAGME = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+class Tabela:
+    """
+    Razred, ki predstavlja tabelo v bazi.
+
+    Polja razreda:
+    - ime: ime tabele
+    - podatki: datoteka s podatki ali None
+    - indeksi: seznam parov (ime indeksa, stolpci)
+    - iskanje: seznam stolpcev za iskalni indeks FTS5
+    - kljuci: seznam parov (stolpec s ključem, izvorni stolpec)
+      za normalizirane iskalne ključe
+    - sprozilci: seznam parov (ime sprožilca, definicija sprožilca)
+    - datumi: seznam stolpcev z datumi, ki se hranijo v obliki ISO 8601
+    """
+    ime = None
+    podatki = None
+    indeksi = []
+    iskanje = []
+    kljuci = []
+    sprozilci = []
+    datumi = []
+
+    def __init__(self, conn):
+        """
+        Konstruktor razreda.
+        """
+        self.conn = conn
+
+    def ustvari(self):
+        """
+        Metoda za ustvarjanje tabele.
+        Podrazredi morajo povoziti to metodo.
+        """
+        raise NotImplementedError
+
+    def obstaja(self):
+        """
+        Ali tabela že obstaja v bazi?
+        """
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?",
+            [self.ime]).fetchone() != (0, )
+
+    def ustvari_indekse(self):
+        """
+        Metoda za ustvarjanje indeksov.
+        Ustvari le indekse, ki še ne obstajajo.
+        """
+        for ime, stolpci in self.indeksi:
+            self.conn.execute("CREATE INDEX IF NOT EXISTS {} ON {} ({});".
+                              format(ime, self.ime, stolpci))
+
+    def ustvari_sprozilce(self):
+        """
+        Metoda za ustvarjanje sprožilcev.
+        Ustvari le sprožilce, ki še ne obstajajo.
+        """
+        for ime, definicija in self.sprozilci:
+            self.conn.execute("CREATE TRIGGER IF NOT EXISTS {} {}".
+                              format(ime, definicija.format(tabela=self.ime)))
+
+    @property
+    def ime_iskanja(self):
+        """
+        Ime virtualne tabele z iskalnim indeksom.
+        """
+        return "{}_iskanje".format(self.ime)
+
+    def ustvari_iskanje(self):
+        """
+        Metoda za ustvarjanje iskalnega indeksa.
+
+        Ustvari virtualno tabelo FTS5 s trigramskim razčlenjevalnikom,
+        ki omogoča iskanje podnizov, in sprožilce,
+        ki indeks ob vstavljanju, spreminjanju in brisanju
+        usklajujejo s tabelo.
+        Če indeks še ne obstaja ali pokriva druge stolpce,
+        ga na novo napolni z obstoječimi vrsticami.
+        """
+        if not self.iskanje:
+            return
+        obstojeci = [vrstica[1] for vrstica in self.conn.execute(
+            "PRAGMA table_info({});".format(self.ime_iskanja))]
+        if obstojeci == self.iskanje:
+            return
+        self.izbrisi_iskanje()
+        stolpci = ", ".join(self.iskanje)
+        novi = ", ".join("new.{}".format(s) for s in self.iskanje)
+        stari = ", ".join("old.{}".format(s) for s in self.iskanje)
+        podatki = dict(tabela=self.ime, iskanje=self.ime_iskanja,
+                       stolpci=stolpci, novi=novi, stari=stari)
+        self.conn.execute("""
+            CREATE VIRTUAL TABLE {iskanje} USING fts5 (
+                {stolpci},
+                content = '{tabela}',
+                content_rowid = 'id',
+                tokenize = 'trigram'
+            );
+        """.format(**podatki))
+        self.conn.execute("""
+            CREATE TRIGGER {iskanje}_vstavi AFTER INSERT ON {tabela} BEGIN
+                INSERT INTO {iskanje} (rowid, {stolpci})
+                VALUES (new.id, {novi});
+            END;
+        """.format(**podatki))
+        self.conn.execute("""
+            CREATE TRIGGER {iskanje}_izbrisi AFTER DELETE ON {tabela} BEGIN
+                INSERT INTO {iskanje} ({iskanje}, rowid, {stolpci})
+                VALUES ('delete', old.id, {stari});
+            END;
+        """.format(**podatki))
+        self.conn.execute("""
+            CREATE TRIGGER {iskanje}_posodobi AFTER UPDATE ON {tabela} BEGIN
+                INSERT INTO {iskanje} ({iskanje}, rowid, {stolpci})
+                VALUES ('delete', old.id, {stari});
+                INSERT INTO {iskanje} (rowid, {stolpci})
+                VALUES (new.id, {novi});
+            END;
+        """.format(**podatki))
+        self.conn.execute("INSERT INTO {0} ({0}) VALUES ('rebuild');".
+                          format(self.ime_iskanja))
+
+    def izbrisi_iskanje(self):
+        """
+        Metoda za brisanje iskalnega indeksa in njegovih sprožilcev.
+        """
+        for sprozilec in ("vstavi", "izbrisi", "posodobi"):
+            self.conn.execute("DROP TRIGGER IF EXISTS {}_{};".
+                              format(self.ime_iskanja, sprozilec))
+        self.conn.execute("DROP TABLE IF EXISTS {};".format(self.ime_iskanja))
+
+    def ustvari_kljuce(self):
+        """
+        Metoda za dodajanje stolpcev z iskalnimi ključi v obstoječo tabelo.
+        Manjkajoče stolpce doda in jih napolni iz izvornih stolpcev.
+        """
+        obstojeci = {vrstica[1] for vrstica in self.conn.execute(
+            "PRAGMA table_info({});".format(self.ime))}
+        manjkajoci = [(kljuc, vir) for kljuc, vir in self.kljuci
+                      if kljuc not in obstojeci]
+        if not manjkajoci:
+            return
+        self.conn.create_function("normaliziraj", 1, normaliziraj,
+                                  deterministic=True)
+        for kljuc, vir in manjkajoci:
+            self.conn.execute("ALTER TABLE {} ADD COLUMN {} TEXT;".
+                              format(self.ime, kljuc))
+            self.conn.execute("UPDATE {} SET {} = normaliziraj({});".
+                              format(self.ime, kljuc, vir))
+
+    def pretvori_datume(self):
+        """
+        Metoda za pretvorbo datumov v obstoječih vrsticah v obliko ISO 8601.
+        Pretvori le datume, ki še niso v tej obliki;
+        neveljavne datume pusti nespremenjene.
+        """
+        if not self.datumi:
+            return
+        def pretvori(niz):
+            try:
+                return normaliziraj_datum(niz)
+            except ValueError:
+                return niz
+        self.conn.create_function("normaliziraj_datum", 1, pretvori,
+                                  deterministic=True)
+        for stolpec in self.datumi:
+            self.conn.execute("""
+                UPDATE {0} SET {1} = normaliziraj_datum({1})
+                WHERE {1} NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]';
+            """.format(self.ime, stolpec))
+
+    def izbrisi(self):
+        """
+        Metoda za brisanje tabele.
+        """
+        if self.iskanje:
+            self.izbrisi_iskanje()
+        self.conn.execute("DROP TABLE IF EXISTS {};".format(self.ime))
+
+
+
+    def uvozi(self, encoding="UTF-8", paket=None, **kwargs):
+        """
+        Metoda za uvoz podatkov.
+        Argumenti:
+        - encoding: kodiranje znakov
+        - paket: število vrstic, ki jih vstavimo naenkrat;
+          če ni podano, vrstice dodajamo posamično
+        - ostali poimenovani argumenti: za metodo dodaj_vrstico
+
+        Datume pretvori v obliko ISO 8601 in vrstice dopolni
+        z normaliziranimi iskalnimi ključi.
+        Tabele, ki povozijo metodo dodaj_vrstico, se vedno uvažajo
+        po vrsticah, da se njihova logika ne obide; za paketni uvoz
+        naj podrazredi povozijo pripravi_vrstico ali pripravi_paket.
+        Vrne število uvoženih vrstic.
+        """
+        if self.podatki is None:
+            return 0
+        with open(self.podatki, encoding=encoding) as datoteka:
+            podatki = csv.reader(datoteka)
+            stolpci = self.pretvori(next(podatki), kwargs)
+            viri = [stolpci.index(vir) for _, vir in self.kljuci]
+            datumi = [stolpci.index(stolpec) for stolpec in self.datumi]
+            poizvedba = self.dodajanje(stolpci + [kljuc for kljuc, _ in self.kljuci])
+            vrstice = ([None if x == "" else x for x in vrstica]
+                       for vrstica in podatki)
+            if datumi:
+                vrstice = ([normaliziraj_datum(x) if i in datumi else x
+                            for i, x in enumerate(vrstica)]
+                           for vrstica in vrstice)
+            if viri:
+                vrstice = (vrstica + [normaliziraj(vrstica[i]) for i in viri]
+                           for vrstica in vrstice)
+            if paket is not None and type(self).dodaj_vrstico is Tabela.dodaj_vrstico:
+                return self.uvozi_pakete(vrstice, poizvedba, paket, **kwargs)
+            stevilo = 0
+            for vrstica in vrstice:
+                self.dodaj_vrstico(vrstica, poizvedba, **kwargs)
+                stevilo += 1
+            return stevilo
+
+    def uvozi_pakete(self, vrstice, poizvedba, paket, **kwargs):
+        """
+        Vstavi vrstice v paketih z executemany znotraj ene transakcije.
+
+        Argumenti:
+        - vrstice: iterator seznamov s podatki
+        - poizvedba: poizvedba za dodajanje vrstice
+        - paket: največje število vrstic v enem klicu executemany
+        - ostali poimenovani argumenti: za metodo pripravi_paket
+
+        Vrne število uvoženih vrstic.
+        """
+        stevilo = 0
+        with self.conn:
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN")
+            while True:
+                kos = self.pripravi_paket(list(islice(vrstice, paket)), **kwargs)
+                if not kos:
+                    break
+                self.conn.executemany(poizvedba, kos)
+                stevilo += len(kos)
+        return stevilo
+
+    def izprazni(self):
+        """
+        Metodo za praznjenje tabele.
+        """
+        self.conn.execute("DELETE FROM {};".format(self.ime))
+
+    @staticmethod
+    def pretvori(stolpci, kwargs):
+        """
+        Prilagodi imena stolpcev
+        in poskrbi za ustrezne argumente za dodaj_vrstico.
+
+        Privzeto vrne podane stolpce.
+        """
+        return stolpci
+
+    def dodajanje(self, stolpci=None, stevilo=None):
+        """
+        Metoda za gradnjo poizvedbe.
+
+        Arugmenti uporabimo enega od njiju):
+        - stolpci: seznam stolpcev
+        - stevilo: število stolpcev
+        """
+        if stolpci is None:
+            assert stevilo is not None
+            st = ""
+        else:
+            st = " ({})".format(", ".join(stolpci))
+            stevilo = len(stolpci)
+        return "INSERT INTO {}{} VALUES ({})". \
+            format(self.ime, st, ", ".join(["?"] * stevilo))
+
+    def pripravi_vrstico(self, podatki, **kwargs):
+        """
+        Pripravi vrstico za vstavljanje.
+
+        Privzeto vrne podane podatke.
+        """
+        return podatki
+
+    def pripravi_paket(self, vrstice, **kwargs):
+        """
+        Pripravi paket vrstic za vstavljanje.
+
+        Privzeto pokliče pripravi_vrstico na vsaki vrstici.
+        """
+        return [self.pripravi_vrstico(vrstica, **kwargs) for vrstica in vrstice]
+
+    def dodaj_vrstico(self, podatki, poizvedba=None, **kwargs):
+        """
+        Metoda za dodajanje vrstice.
+
+        Argumenti:
+        - podatki: seznam s podatki v vrstici
+        - poizvedba: poizvedba, ki naj se zažene
+        - poljubni poimenovani parametri: za metodo pripravi_vrstico
+
+        Vrstico pred vstavljanjem pripravi z metodo pripravi_vrstico.
+        """
+        podatki = self.pripravi_vrstico(podatki, **kwargs)
+        if poizvedba is None:
+            poizvedba = self.dodajanje(stevilo=len(podatki))
+        cur = self.conn.execute(poizvedba, podatki)
+        return cur.lastrowid
+
+
+class Uporabnik(Tabela):
+    """
+    Tabela za uporabnike.
+    """
+    ime = "uporabnik"
+    podatki = "podatki/uporabnik.csv"
+
+    def ustvari(self):
+        """
+        Ustvari tabelo uporabnik.
+        """
+        self.conn.execute("""
+            CREATE TABLE uporabnik (
+                id        INTEGER PRIMARY KEY AUTOINCREMENT,
+                ime       TEXT NOT NULL UNIQUE,
+                zgostitev TEXT NOT NULL,
+                sol       TEXT NOT NULL
+            )
+        """)
+
+    @staticmethod
+    def pretvori(stolpci, kwargs):
+        """
+        Zapomni si indeksa stolpcev za zgostitev in sol.
+        """
+        kwargs["zgostitev"] = stolpci.index("zgostitev")
+        kwargs["sol"] = stolpci.index("sol")
+        return stolpci
+
+    def pripravi_vrstico(self, podatki, zgostitev=None, sol=None):
+        """
+        Če sol ni podana, zašifrira podano geslo.
+        """
+        if sol is not None and zgostitev is not None and podatki[sol] is None:
+            podatki[zgostitev], podatki[sol] = sifriraj_geslo(podatki[zgostitev])
+        return podatki
+
+    def uvozi_pakete(self, vrstice, poizvedba, paket, **kwargs):
+        """
+        Uvozi uporabnike v paketih.
+        Gesla zašifrira vzporedno v bazenu procesov.
+        """
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as bazen:
+            return super().uvozi_pakete(vrstice, poizvedba, paket,
+                                        bazen=bazen, **kwargs)
+
+    def pripravi_paket(self, vrstice, zgostitev=None, sol=None, bazen=None):
+        """
+        Zašifrira gesla vseh vrstic v paketu, ki nimajo podane soli.
+
+        Če je podan bazen procesov, gesla šifriramo vzporedno.
+        Rezultati se vrnejo v vrstnem redu vrstic,
+        zato je morebitna napaka vedno javljena za prvo napačno vrstico.
+        """
+        if bazen is None or sol is None or zgostitev is None:
+            return super().pripravi_paket(vrstice, zgostitev=zgostitev, sol=sol)
+        brez_soli = [vrstica for vrstica in vrstice if vrstica[sol] is None]
+        gesla = [vrstica[zgostitev] for vrstica in brez_soli]
+        kos = max(1, len(gesla) // (4 * (os.cpu_count() or 1)))
+        for vrstica, sifra in zip(brez_soli, bazen.map(sifriraj_geslo, gesla,
+                                                        chunksize=kos)):
+            vrstica[zgostitev], vrstica[sol] = sifra
+        return vrstice
+
+
+class Cepiva(Tabela):
+    """
+    Tabela za cepiva.
+    """
+    ime = "cepiva"
+    podatki = "podatki/cepiva.csv"
+
+    def ustvari(self):
+        """
+        Ustvari tabelo cepiva.
+        """
+        self.conn.execute("""
+            CREATE TABLE cepiva (
+                id    INTEGER PRIMARY KEY AUTOINCREMENT,
+                naziv TEXT UNIQUE
+            );
+        """)
+
+
+class Prostor(Tabela):
+    """
+    Tabela za prostor.
+    """
+    ime = "prostor"
+    podatki = "podatki/prostor.csv"
+    indeksi = [("prostor_oddelek", "oddelek")]
+
+    def ustvari(self):
+        """
+        Ustvari tabelo prostor.
+        """
+        self.conn.execute("""
+            CREATE TABLE prostor (
+                id           INTEGER PRIMARY KEY AUTOINCREMENT,
+                oddelek      CHARACTER CHECK (oddelek IN ('M','P')),
+                kapaciteta   INTEGER,
+                zasedenost   INTEGER
+            );
+        """)
+
+
+class Zival(Tabela):
+    """
+    Tabela za zivali.
+    """
+    ime = "zival"
+    podatki = "podatki/zival.csv"
+    indeksi = [
+        ("zival_vrsta_dat_roj", "vrsta, dat_roj"),
+        ("zival_ime_kljuc", "ime_kljuc"),
+        ("zival_dat_roj", "dat_roj"),
+        ("zival_dat_spr", "dat_spr"),
+    ]
+    iskanje = ["ime_kljuc"]
+    kljuci = [("ime_kljuc", "ime")]
+    datumi = ["dat_roj", "dat_spr"]
+
+
+    def __init__(self, conn):
+        """
+        Konstruktor tabele.
+
+        Argumenti:
+        - conn: povezava na bazo
+        """
+        super().__init__(conn)
+        #self.oznaka = oznaka
+
+    def ustvari(self):
+        """
+        Ustavari tabelo zival.
+        """
+        self.conn.execute("""
+            CREATE TABLE zival (
+                id         INTEGER PRIMARY KEY,
+                ime        TEXT,
+                spol       CHARACTER CHECK (spol IN ('M','Z')),
+                vrsta      CHARACTER CHECK (vrsta IN ('M','P')),
+                dat_roj    DATE,
+                dat_spr    DATE,
+                bolezni    TEXT,
+                ime_kljuc  TEXT
+            );
+        """)
+
+
+class Oseba(Tabela):
+    """
+    Tabela za osebe.
+    """
+    ime = "oseba"
+    podatki = "podatki/oseba.csv"
+    indeksi = [
+        ("oseba_ime_kljuc", "ime_kljuc"),
+        ("oseba_priimek_kljuc", "priimek_kljuc"),
+    ]
+    iskanje = ["ime_kljuc", "priimek_kljuc", "mail"]
+    kljuci = [("ime_kljuc", "ime"), ("priimek_kljuc", "priimek")]
+   
+
+    def ustvari(self):
+        """
+        Ustvari tabelo oseba.
+        """
+        self.conn.execute("""
+            CREATE TABLE oseba (
+                id            INTEGER PRIMARY KEY,
+                ime           TEXT,
+                priimek       TEXT,
+                mail          TEXT,
+                ime_kljuc     TEXT,
+                priimek_kljuc TEXT
+            );
+        """)
+
+
+class Posvojitev(Tabela):
+    """
+    Tabela za posvojitve.
+    """
+    ime = "posvojitev"
+    indeksi = [
+        ("posvojitev_id_z", "id_z"),
+        ("posvojitev_datum", "datum"),
+    ]
+    datumi = ["datum"]
+   
+
+    def ustvari(self):
+        """
+        Ustvari tabelo pos.
+        """
+        self.conn.execute("""
+            CREATE TABLE posvojitev (
+                id        INTEGER PRIMARY KEY,
+                id_z      INTEGER,
+                id_o      INTEGER,
+                datum     DATE
+            );
+        """)
+
+
+class Cepljenja(Tabela):
+    """
+    Tabela za cep.
+    """
+    ime = "cepljenja"
+    indeksi = [("cepljenja_id_z_id_c", "id_z, id_c")]
+    sprozilci = [
+        ("cepljenja_precepljenost_vstavi", """
+            AFTER INSERT ON {tabela}
+            WHEN EXISTS (SELECT 1 FROM namestitev WHERE id_z = new.id_z)
+            AND NOT EXISTS (SELECT 1 FROM cepljenja
+                            WHERE id_z = new.id_z AND id_c = new.id_c AND id <> new.id)
+            BEGIN
+                INSERT INTO precepljenost (id_c, vrsta, stevilo)
+                SELECT new.id_c, vrsta, 1 FROM zival WHERE id = new.id_z
+                ON CONFLICT (id_c, vrsta) DO UPDATE SET stevilo = stevilo + 1;
+            END;
+        """),
+        ("cepljenja_precepljenost_izbrisi", """
+            AFTER DELETE ON {tabela}
+            WHEN EXISTS (SELECT 1 FROM namestitev WHERE id_z = old.id_z)
+            AND NOT EXISTS (SELECT 1 FROM cepljenja
+                            WHERE id_z = old.id_z AND id_c = old.id_c)
+            BEGIN
+                UPDATE precepljenost SET stevilo = stevilo - 1
+                WHERE id_c = old.id_c
+                AND vrsta = (SELECT vrsta FROM zival WHERE id = old.id_z);
+            END;
+        """),
+    ]
+
+
+    def ustvari(self):
+        """
+        Ustvari tabelo cep.
+        """
+        self.conn.execute("""
+            CREATE TABLE cepljenja (
+                id       INTEGER PRIMARY KEY,
+                id_z     INTEGER,
+                id_c     INTEGER
+            );
+        """)
+
+class Namestitev(Tabela):
+    """
+    Tabela za namestitev
+    """
+    ime = "namestitev"
+    podatki = "podatki/namestitev.csv"
+    indeksi = [
+        ("namestitev_id_z", "id_z"),
+        ("namestitev_id_p", "id_p"),
+    ]
+    sprozilci = [
+        ("namestitev_preveri", """
+            BEFORE INSERT ON {tabela}
+            WHEN (SELECT kapaciteta <= zasedenost FROM prostor
+                  WHERE id = new.id_p)
+            BEGIN
+                SELECT RAISE(ABORT, 'prostor je poln');
+            END;
+        """),
+        ("namestitev_vstavi", """
+            AFTER INSERT ON {tabela} BEGIN
+                UPDATE prostor SET zasedenost = zasedenost + 1
+                WHERE id = new.id_p;
+            END;
+        """),
+        ("namestitev_izbrisi", """
+            AFTER DELETE ON {tabela} BEGIN
+                UPDATE prostor SET zasedenost = zasedenost - 1
+                WHERE id = old.id_p;
+            END;
+        """),
+        ("namestitev_posodobi", """
+            AFTER UPDATE OF id_p ON {tabela} BEGIN
+                UPDATE prostor SET zasedenost = zasedenost - 1
+                WHERE id = old.id_p;
+                UPDATE prostor SET zasedenost = zasedenost + 1
+                WHERE id = new.id_p;
+            END;
+        """),
+        ("namestitev_precepljenost_vstavi", """
+            AFTER INSERT ON {tabela}
+            WHEN NOT EXISTS (SELECT 1 FROM namestitev
+                             WHERE id_z = new.id_z AND rowid <> new.rowid)
+            BEGIN
+                INSERT INTO namescenost (vrsta, stevilo)
+                SELECT vrsta, 1 FROM zival WHERE id = new.id_z
+                ON CONFLICT (vrsta) DO UPDATE SET stevilo = stevilo + 1;
+                INSERT INTO precepljenost (id_c, vrsta, stevilo)
+                SELECT DISTINCT cepljenja.id_c, zival.vrsta, 1
+                FROM cepljenja JOIN zival ON zival.id = cepljenja.id_z
+                WHERE cepljenja.id_z = new.id_z
+                ON CONFLICT (id_c, vrsta) DO UPDATE SET stevilo = stevilo + 1;
+            END;
+        """),
+        ("namestitev_precepljenost_izbrisi", """
+            AFTER DELETE ON {tabela}
+            WHEN NOT EXISTS (SELECT 1 FROM namestitev WHERE id_z = old.id_z)
+            BEGIN
+                UPDATE namescenost SET stevilo = stevilo - 1
+                WHERE vrsta = (SELECT vrsta FROM zival WHERE id = old.id_z);
+                UPDATE precepljenost SET stevilo = stevilo - 1
+                WHERE vrsta = (SELECT vrsta FROM zival WHERE id = old.id_z)
+                AND id_c IN (SELECT id_c FROM cepljenja WHERE id_z = old.id_z);
+            END;
+        """),
+    ]
+
+
+    def ustvari(self):
+        """
+        Ustvari tabelo namestitev.
+        """
+        self.conn.execute("""
+            CREATE TABLE namestitev (
+                id_z INTEGER REFERENCES zival (id),
+                id_p INTEGER REFERENCES prostor (id)
+            );
+        """)
+
+class Namescenost(Tabela):
+    """
+    Povzetek: število živali posamezne vrste, ki so nameščene v zavetišču.
+    Vzdržujejo ga sprožilci na tabeli namestitev.
+    """
+    ime = "namescenost"
+
+    def ustvari(self):
+        """
+        Ustvari tabelo namescenost.
+        """
+        self.conn.execute("""
+            CREATE TABLE namescenost (
+                vrsta    CHARACTER PRIMARY KEY,
+                stevilo  INTEGER NOT NULL
+            );
+        """)
+
+
+class Precepljenost(Tabela):
+    """
+    Povzetek: število nameščenih živali posamezne vrste,
+    cepljenih s posameznim cepivom.
+    Vzdržujejo ga sprožilci na tabelah cepljenja in namestitev.
+    """
+    ime = "precepljenost"
+
+    def ustvari(self):
+        """
+        Ustvari tabelo precepljenost.
+        """
+        self.conn.execute("""
+            CREATE TABLE precepljenost (
+                id_c     INTEGER,
+                vrsta    CHARACTER,
+                stevilo  INTEGER NOT NULL,
+                PRIMARY KEY (id_c, vrsta)
+            );
+        """)
+
+
+class Seja(Tabela):
+    """
+    Tabela za seje prijavljenih uporabnikov,
+    ki naj ostanejo veljavne tudi po ponovnem zagonu strežnika.
+    """
+    ime = "seja"
+    indeksi = [("seja_rok", "rok")]
+
+    def ustvari(self):
+        """
+        Ustvari tabelo seja.
+        """
+        self.conn.execute("""
+            CREATE TABLE seja (
+                id   TEXT PRIMARY KEY,
+                ime  TEXT NOT NULL,
+                uid  INTEGER NOT NULL,
+                rok  REAL NOT NULL
+            ) WITHOUT ROWID;
+        """)
+
+
+def ustvari_tabele(tabele):
+    """
+    Ustvari podane tabele.
+    """
+    for t in tabele:
+        t.ustvari()
+
+
+def ustvari_manjkajoce_tabele(tabele):
+    """
+    Ustvari tiste od podanih tabel, ki še ne obstajajo.
+    """
+    for t in tabele:
+        if not t.obstaja():
+            t.ustvari()
+
+
+def izbrisi_tabele(tabele):
+    """
+    Izbriši podane tabele.
+    """
+    for t in tabele:
+        t.izbrisi()
+
+def izprazni_tabele(tabele):
+    """
+    Izprazni podane tabele.
+    """
+    for t in tabele:
+        t.izprazni()
+
+def ustvari_indekse(tabele):
+    """
+    Ustvari indekse podanih tabel.
+    """
+    for t in tabele:
+        t.ustvari_indekse()
+
+def ustvari_kljuce(tabele):
+    """
+    Podanim tabelam doda manjkajoče stolpce z iskalnimi ključi.
+    """
+    for t in tabele:
+        t.ustvari_kljuce()
+
+
+def ustvari_sprozilce(tabele):
+    """
+    Ustvari sprožilce podanih tabel.
+    """
+    for t in tabele:
+        t.ustvari_sprozilce()
+
+
+def uskladi_zasedenost(conn):
+    """
+    Zasedenost vseh prostorov v enem prehodu izračuna iz namestitev.
+
+    Spremeni le prostore, pri katerih se zasedenost ne ujema
+    s številom namestitev, in vrne njihovo število.
+    """
+    return conn.execute("""
+        UPDATE prostor SET zasedenost = stevci.stevilo
+        FROM (
+            SELECT prostor.id AS id_p, COUNT(namestitev.id_p) AS stevilo
+            FROM prostor LEFT JOIN namestitev ON namestitev.id_p = prostor.id
+            GROUP BY prostor.id
+        ) AS stevci
+        WHERE prostor.id = stevci.id_p
+        AND prostor.zasedenost IS NOT stevci.stevilo
+    """).rowcount
+
+
+def preracunaj_precepljenost(conn):
+    """
+    Povzetka namescenost in precepljenost na novo izračuna
+    z združevalnima poizvedbama.
+    """
+    conn.execute("DELETE FROM namescenost")
+    conn.execute("""
+        INSERT INTO namescenost (vrsta, stevilo)
+        SELECT vrsta, COUNT(*) FROM zival
+        WHERE id IN (SELECT id_z FROM namestitev)
+        GROUP BY vrsta
+    """)
+    conn.execute("DELETE FROM precepljenost")
+    conn.execute("""
+        INSERT INTO precepljenost (id_c, vrsta, stevilo)
+        SELECT cepljenja.id_c, zival.vrsta, COUNT(DISTINCT zival.id)
+        FROM cepljenja JOIN zival ON zival.id = cepljenja.id_z
+        WHERE zival.id IN (SELECT id_z FROM namestitev)
+        GROUP BY cepljenja.id_c, zival.vrsta
+    """)
+
+
+def pretvori_datume(tabele):
+    """
+    V podanih tabelah pretvori datume v obliko ISO 8601.
+    """
+    for t in tabele:
+        t.pretvori_datume()
+
+
+def ustvari_iskanje(tabele):
+    """
+    Ustvari iskalne indekse podanih tabel.
+    """
+    for t in tabele:
+        t.ustvari_iskanje()
+
+def uvozi_podatke(tabele, paket=PAKET):
+    """
+    Uvozi podatke v podane tabele.
+
+    Argumenti:
+    - tabele: seznam tabel
+    - paket: število vrstic, ki jih vstavimo naenkrat,
+      ali None za dodajanje po vrsticah
+
+    Za vsako tabelo izpiše število uvoženih vrstic in hitrost uvoza.
+    """
+    for t in tabele:
+        zacetek = time.perf_counter()
+        stevilo = t.uvozi(paket=paket)
+        if stevilo:
+            cas = time.perf_counter() - zacetek
+            print("Tabela {}: uvoženih {} vrstic ({:.0f} vrstic/s)".format(
+                t.ime, stevilo, stevilo / cas if cas > 0 else float("inf")))
+
+
+def ustvari_bazo(conn):
+    """
+    Izvede ustvarjanje baze.
+    """
+    tabele = pripravi_tabele(conn)
+    izbrisi_tabele(tabele)
+    ustvari_tabele(tabele)
+    uvozi_podatke(tabele)
+    ustvari_indekse(tabele)
+    ustvari_iskanje(tabele)
+    uskladi_zasedenost(conn)
+    preracunaj_precepljenost(conn)
+    ustvari_sprozilce(tabele)
+    conn.execute("PRAGMA user_version = {}".format(RAZLICICA))
+
+def pripravi_tabele(conn):
+    """
+    Pripravi objekte za tabele.
+    """
+    uporabnik = Uporabnik(conn)
+    cepiva = Cepiva(conn)
+    prostor = Prostor(conn)
+    zival = Zival(conn)
+    oseba = Oseba(conn)
+    posvojitev = Posvojitev(conn)
+    cepljenja = Cepljenja(conn)
+    namestitev = Namestitev(conn)
+    namescenost = Namescenost(conn)
+    precepljenost = Precepljenost(conn)
+    seja = Seja(conn)
+    return [uporabnik, cepiva, prostor, zival, oseba, posvojitev, cepljenja, namestitev,
+            namescenost, precepljenost, seja]
+
+
+def ustvari_bazo_ce_ne_obstaja(conn):
+    """
+    Ustvari bazo, če ta še ne obstaja.
+    """
+    with conn:
+        cur = conn.execute("SELECT COUNT(*) FROM sqlite_master")
+        if cur.fetchone() == (0, ):
+            ustvari_bazo(conn)
+        else:
+            posodobi_bazo(conn)
+
+
+def posodobi_bazo(conn):
+    """
+    Obstoječo bazo posodobi na trenutno shemo.
+
+    Če je baza starejše različice (PRAGMA user_version), ustvari
+    manjkajoče tabele, doda manjkajoče stolpce z iskalnimi ključi,
+    datume pretvori v obliko ISO 8601, ustvari manjkajoče indekse
+    in sprožilce, uskladi zasedenost prostorov in povzetke precepljenosti
+    ter zapiše novo različico. Ob vsakem zagonu le osveži statistiko
+    za načrtovalnik poizvedb.
+    """
+    razlicica = conn.execute("PRAGMA user_version").fetchone()[0]
+    if razlicica < RAZLICICA:
+        tabele = pripravi_tabele(conn)
+        ustvari_manjkajoce_tabele(tabele)
+        ustvari_kljuce(tabele)
+        pretvori_datume(tabele)
+        ustvari_indekse(tabele)
+        ustvari_iskanje(tabele)
+        uskladi_zasedenost(conn)
+        preracunaj_precepljenost(conn)
+        ustvari_sprozilce(tabele)
+        conn.execute("PRAGMA user_version = {}".format(RAZLICICA))
+    conn.execute("PRAGMA optimize")
+
+
+def nacrt_poizvedbe(conn, sql, parametri=()):
+    """
+    Vrne seznam korakov načrta izvajanja poizvedbe (EXPLAIN QUERY PLAN).
+    """
+    return [vrstica[-1] for vrstica in
+            conn.execute("EXPLAIN QUERY PLAN " + sql, parametri)]
+
+
+def preveri_nacrte(conn, poizvedbe):
+    """
+    Preveri, ali poizvedbe uporabljajo indekse.
+
+    Argumenti:
+    - conn: povezava na bazo
+    - poizvedbe: seznam parov (poizvedba, parametri)
+
+    Vrne slovar, ki poizvedbam, ki pregledajo celotno tabelo
+    ali rezultat urejajo v začasnem drevesu, priredi njihov načrt.
+    Iskanje po indeksu FTS5 (MATCH) in pregled parametra s funkcijo
+    json_each se ne štejeta za pregled tabele.
+    """
+    slabe = {}
+    for sql, parametri in poizvedbe:
+        nacrt = nacrt_poizvedbe(conn, sql, parametri)
+        if any(korak.startswith("SCAN ") and ":M" not in korak
+               and not korak.startswith("SCAN json_each")
+               or "TEMP B-TREE" in korak for korak in nacrt):
+            slabe[sql] = nacrt
+    return slabe
+
+
+@contextmanager
+def transakcija(conn):
+    """
+    Upravitelj konteksta za transakcijo.
+
+    Transakcija se začne z BEGIN IMMEDIATE, zato takoj zaklene bazo
+    za pisanje in ji druge povezave med branjem in pisanjem ne morejo
+    spremeniti podatkov.
+    Ob napaki transakcijo prekliče, sicer jo potrdi,
+    če je blok ni že sam preklical.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    if conn.in_transaction:
+        conn.commit()
+
+
+def zaklenjena(napaka):
+    """
+    Ali je napaka posledica zaklenjene baze (SQLITE_BUSY ali SQLITE_LOCKED)?
+    """
+    return isinstance(napaka, sqlite3.OperationalError) and \
+        ("locked" in str(napaka) or "busy" in str(napaka))
+
+
+def ponovi_ob_zaklepu(poskusi=5, cakanje=0.05):
+    """
+    Dekorator, ki funkcijo ob zaklenjeni bazi ponovno pokliče.
+
+    Argumenti:
+    - poskusi: največje število klicev
+    - cakanje: čas v sekundah pred prvo ponovitvijo;
+      pred vsako naslednjo se podvoji
+    """
+    def dekorator(fun):
+        @wraps(fun)
+        def funkcija(*largs, **kwargs):
+            for poskus in range(poskusi):
+                try:
+                    return fun(*largs, **kwargs)
+                except sqlite3.OperationalError as napaka:
+                    if not zaklenjena(napaka) or poskus == poskusi - 1:
+                        raise
+                time.sleep(cakanje * 2 ** poskus * (0.5 + random.random()))
+        return funkcija
+    return dekorator
+
+
+class Bazen:
+    """
+    Omejen bazen povezav na bazo.
+
+    Vsaka nit ima naenkrat prevzeto največ eno povezavo.
+    Povezave se odpirajo po potrebi, dokler jih ni toliko, kot je velikost
+    bazena; nato niti čakajo, da katera od povezav postane prosta.
+
+    Polja razreda:
+    - datoteka: datoteka z bazo
+    - velikost: največje število odprtih povezav
+    - cakanje: koliko sekund nit največ čaka na prosto povezavo
+    - pragme: slovar nastavitev SQLite, ki jih nastavimo vsaki povezavi
+    """
+
+    def __init__(self, datoteka, velikost=8, cakanje=30, pragme=None):
+        """
+        Konstruktor bazena.
+
+        Podane pragme dopolnijo privzete iz PRAGME.
+        """
+        self.datoteka = datoteka
+        self.velikost = velikost
+        self.cakanje = cakanje
+        self.pragme = dict(PRAGME)
+        self.pragme.update(pragme or {})
+        for ime, vrednost in self.pragme.items():
+            if ime not in PRAGME:
+                raise ValueError("Neznana pragma: {}".format(ime))
+            if not isinstance(vrednost, (int, str)) or \
+                    isinstance(vrednost, str) and not vrednost.isalnum():
+                raise ValueError("Neveljavna vrednost pragme {}: {!r}".
+                                 format(ime, vrednost))
+        self.vse = []
+        self.podedovane = []
+        self.ponastavi()
+        os.register_at_fork(after_in_child=self.ponastavi)
+
+    def ponastavi(self):
+        """
+        Pozabi vse povezave.
+
+        Kliče se tudi v otroku po fork, saj povezav SQLite
+        ne smemo uporabljati v več procesih. Podedovanih povezav otrok
+        ne sme niti zapreti (zapiranje bi sprostilo zaklepe in stanje
+        datoteke, ki pripadajo staršu), zato jih hrani v seznamu
+        podedovane, da jih ne zapre čistilec pomnilnika.
+        """
+        self.podedovane.extend(self.vse)
+        self.vse = []
+        self.proste = queue.LifoQueue()
+        self.odprte = 0
+        self.kljucavnica = threading.Lock()
+        self.lokalno = threading.local()
+
+    def odpri(self):
+        """
+        Odpre novo povezavo na bazo in ji nastavi pragme.
+        Povezavo si zapomni, da jo po fork ohrani kot podedovano.
+        """
+        conn = sqlite3.connect(self.datoteka, check_same_thread=False)
+        self.vse.append(conn)
+        conn.execute("PRAGMA foreign_keys = ON")
+        for ime, vrednost in self.pragme.items():
+            conn.execute("PRAGMA {} = {}".format(ime, vrednost))
+        return conn
+
+    def porocilo(self):
+        """
+        Vrne slovar z dejanskimi vrednostmi pragem na povezavi iz bazena.
+        """
+        with self.povezava() as conn:
+            return {ime: conn.execute("PRAGMA {}".format(ime)).fetchone()[0]
+                    for ime in self.pragme}
+
+    def prevzemi(self):
+        """
+        Vrne povezavo trenutne niti.
+        Če je nit še nima, ji dodeli prosto ali novo povezavo.
+        """
+        conn = getattr(self.lokalno, "conn", None)
+        if conn is not None:
+            return conn
+        try:
+            conn = self.proste.get_nowait()
+        except queue.Empty:
+            with self.kljucavnica:
+                nova = self.odprte < self.velikost
+                if nova:
+                    self.odprte += 1
+            if nova:
+                try:
+                    conn = self.odpri()
+                except Exception:
+                    with self.kljucavnica:
+                        self.odprte -= 1
+                    raise
+            else:
+                try:
+                    conn = self.proste.get(timeout=self.cakanje)
+                except queue.Empty:
+                    raise sqlite3.OperationalError("Ni proste povezave na bazo.")
+        self.lokalno.conn = conn
+        return conn
+
+    def vrni(self):
+        """
+        Povezavo trenutne niti vrne v bazen.
+        Morebitno nezaključeno transakcijo prekliče.
+        """
+        conn = getattr(self.lokalno, "conn", None)
+        if conn is None:
+            return
+        self.lokalno.conn = None
+        if conn.in_transaction:
+            conn.rollback()
+        self.proste.put(conn)
+
+    @contextmanager
+    def povezava(self):
+        """
+        Upravitelj konteksta, ki za čas bloka prevzame povezavo.
+        """
+        try:
+            yield self.prevzemi()
+        finally:
+            self.vrni()
+
+
+class Povezava:
+    """
+    Povezava, ki vse klice posreduje povezavi trenutne niti iz bazena.
+
+    Objekt lahko uporabljamo povsod, kjer bi sicer uporabili
+    povezavo iz modula sqlite3, tudi kot upravitelja konteksta.
+    """
+
+    def __init__(self, bazen):
+        """
+        Konstruktor povezave.
+        """
+        self.bazen = bazen
+
+    def __getattr__(self, ime):
+        """
+        Vrne atribut povezave trenutne niti.
+        """
+        return getattr(self.bazen.prevzemi(), ime)
+
+    def __enter__(self):
+        """
+        Začne blok transakcije na povezavi trenutne niti.
+        """
+        return self.bazen.prevzemi().__enter__()
+
+    def __exit__(self, *napaka):
+        """
+        Zaključi blok transakcije na povezavi trenutne niti.
+        """
+        return self.bazen.prevzemi().__exit__(*napaka)
+
+
+if __name__ == '__main__':
+    import sys
+    datoteka = sys.argv[1] if len(sys.argv) > 1 else 'baza_zavetisce.db'
+    with sqlite3.connect(datoteka) as conn:
+        print("Usklajenih prostorov: {}".format(uskladi_zasedenost(conn)))
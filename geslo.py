@@ -1,32 +1,299 @@
-import os
-import hashlib
-import hmac
-
-
-def zgosti(geslo, sol):
-    """
-    Vrne zgostitev gesla pri podani soli.
-    Uporabi funkcijo PBKDF2_HMAC za izpeljavo ključa
-    z zgoščevalno funkcijo SHA256 in 100000 ponovitvami.
-    """
-    return hashlib.pbkdf2_hmac('sha256', geslo.encode('utf-8'), sol, 100000)
-
-
-def sifriraj_geslo(geslo):
-    """
-    Vrne zgoščeno geslo skupaj z uporabljeno soljo.
-    """
-    sol = os.urandom(32)
-    zgostitev = zgosti(geslo, sol)
-    return (zgostitev.hex(), sol.hex())
-
-
-def preveri_geslo(geslo, zgostitev, sol):
-    """
-    Preveri, ali podano geslo ustreza podani zgostitvi in soli.
-    """
-    try:
-        return hmac.compare_digest(bytes.fromhex(zgostitev),
-                                   zgosti(geslo, bytes.fromhex(sol)))
-    except ValueError:
-        return False
\ No newline at end of file
+import argparse
+import json
+import os
+import hashlib
+import hmac
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from nastavitve import nastavitve
+
+
+ALGORITMI = {
+    'pbkdf2_sha256': lambda geslo, sol, i:
+        hashlib.pbkdf2_hmac('sha256', geslo, sol, i),
+    'scrypt': lambda geslo, sol, n, r, p:
+        hashlib.scrypt(geslo, salt=sol, n=n, r=r, p=p, maxmem=256 * n * r + 2 ** 20),
+}
+
+PRIVZETI_PARAMETRI = {
+    'pbkdf2_sha256': {'i': 100000},
+    'scrypt': {'n': 2 ** 14, 'r': 8, 'p': 1},
+}
+
+ZGOSCEVANJE = nastavitve.get('zgoscevanje', {})
+ALGORITEM = ZGOSCEVANJE.get('algoritem', 'pbkdf2_sha256')
+PARAMETRI = dict(PRIVZETI_PARAMETRI[ALGORITEM], **ZGOSCEVANJE.get('parametri', {}))
+
+
+def zgosti(geslo, sol, algoritem='pbkdf2_sha256', parametri=None):
+    """
+    Vrne zgostitev gesla pri podani soli.
+    Privzeto uporabi funkcijo PBKDF2_HMAC za izpeljavo ključa
+    z zgoščevalno funkcijo SHA256 in 100000 ponovitvami.
+
+    Argumenti:
+    - algoritem: ključ v slovarju ALGORITMI
+    - parametri: slovar parametrov algoritma
+      (privzeto iz PRIVZETI_PARAMETRI)
+    """
+    if parametri is None:
+        parametri = PRIVZETI_PARAMETRI[algoritem]
+    return ALGORITMI[algoritem](geslo.encode('utf-8'), sol, **parametri)
+
+
+def zapisi(algoritem, parametri, zgostitev):
+    """
+    Vrne zapis zgostitve v obliki algoritem$k=v,...$zgostitev.
+    """
+    return "{}${}${}".format(
+        algoritem,
+        ",".join("{}={}".format(k, v) for k, v in sorted(parametri.items())),
+        zgostitev.hex())
+
+
+def razberi(zapis):
+    """
+    Iz zapisa zgostitve vrne trojico (algoritem, parametri, zgostitev).
+    Zapis brez algoritma in parametrov je zgostitev PBKDF2_HMAC
+    s 100000 ponovitvami, kot so jo shranjevale starejše različice.
+    Ob neveljavnem zapisu, tudi ob manjkajočih, odvečnih ali
+    nepozitivnih parametrih algoritma, sproži ValueError.
+    """
+    if "$" not in zapis:
+        return 'pbkdf2_sha256', {'i': 100000}, bytes.fromhex(zapis)
+    algoritem, parametri, zgostitev = zapis.split("$")
+    if algoritem not in ALGORITMI:
+        raise ValueError("Neznan algoritem: {}".format(algoritem))
+    parametri = {k: int(v) for k, v in
+                 (par.split("=") for par in parametri.split(","))}
+    if parametri.keys() != PRIVZETI_PARAMETRI[algoritem].keys():
+        raise ValueError("Neveljavni parametri algoritma {}: {}".format(
+            algoritem, ", ".join(sorted(parametri))))
+    if any(v <= 0 for v in parametri.values()):
+        raise ValueError("Parametri algoritma {} morajo biti pozitivni.".format(algoritem))
+    return algoritem, parametri, bytes.fromhex(zgostitev)
+
+
+def sifriraj_geslo(geslo, algoritem=None, parametri=None):
+    """
+    Vrne zapis zgostitve gesla skupaj z uporabljeno soljo.
+    Privzeto uporabi algoritem in parametre iz nastavitev.
+    """
+    if algoritem is None:
+        algoritem, parametri = ALGORITEM, PARAMETRI
+    sol = os.urandom(32)
+    zgostitev = zgosti(geslo, sol, algoritem, parametri)
+    return (zapisi(algoritem, parametri, zgostitev), sol.hex())
+
+
+def preveri_geslo(geslo, zgostitev, sol):
+    """
+    Preveri, ali podano geslo ustreza podani zgostitvi in soli.
+    """
+    try:
+        algoritem, parametri, zgostitev = razberi(zgostitev)
+        return hmac.compare_digest(zgostitev,
+                                   zgosti(geslo, bytes.fromhex(sol), algoritem, parametri))
+    except ValueError:
+        return False
+
+
+def zastarela(zgostitev):
+    """
+    Ali je zgostitev narejena z drugim algoritmom ali parametri,
+    kot so nastavljeni?
+    """
+    try:
+        algoritem, parametri, _ = razberi(zgostitev)
+    except ValueError:
+        return True
+    return (algoritem, parametri) != (ALGORITEM, PARAMETRI)
+
+
+class PreobremenitevError(Exception):
+    """
+    Napaka, ko je v vrsti za izpeljavo ključev preveč zahtev
+    ali ko izpeljava ne konča pravočasno.
+    """
+    pass
+
+
+class BazenGesel:
+    """
+    Omejen bazen procesov za zgoščevanje in preverjanje gesel.
+
+    Niti zahtev med izpeljavo ključa le čakajo na rezultat.
+    Če je v bazenu že največ dovoljenih nalog, nova zahteva takoj
+    dobi napako PreobremenitevError, prav tako zahteva,
+    ki rezultata ne dobi v dovoljenem času.
+
+    Procesi se ne ustvarjajo s fork iz procesa strežnika, ampak
+    z načinom forkserver ali spawn, zato ne podedujejo niti, ključavnic
+    in povezav na bazo. Kot pri vsakem takem zagonu vsak proces ob zagonu
+    znova uvozi glavni modul programa, zato ta ob uvozu ne sme dostopati
+    do baze ali izpisovati; to naredi šele ob zagonu strežnika.
+    """
+
+    def __init__(self, procesi=None, vrsta=None, cakanje=5, nacin=None):
+        """
+        Konstruktor bazena.
+
+        Argumenti:
+        - procesi: število procesov (privzeto število procesorjev)
+        - vrsta: največje število nalog, ki se izvajajo ali čakajo
+          (privzeto dvakratno število procesov)
+        - cakanje: največji čas čakanja na rezultat v sekundah
+        - nacin: način zagona procesov, 'forkserver' ali 'spawn'
+          (privzeto forkserver, kjer je na voljo)
+        """
+        self.procesi = procesi or os.cpu_count() or 1
+        self.vrsta = vrsta or 2 * self.procesi
+        self.cakanje = cakanje
+        if nacin is None:
+            nacin = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() \
+                else 'spawn'
+        self.kontekst = multiprocessing.get_context(nacin)
+        if nacin == 'forkserver':
+            self.kontekst.set_forkserver_preload(['geslo'])
+        self.podedovani = []
+        self.izvajalec = None
+        self.ponastavi()
+        os.register_at_fork(after_in_child=self.ponastavi)
+
+    def ponastavi(self):
+        """
+        Pozabi procese; novi se ustvarijo ob prvi nalogi.
+        Kliče se tudi v otroku po fork, saj procesi pripadajo staršu.
+        Podedovani izvajalec ostane shranjen, da ga otrok ne zapre.
+        """
+        if self.izvajalec is not None:
+            self.podedovani.append(self.izvajalec)
+        self.izvajalec = None
+        self.kljucavnica = threading.Lock()
+        self.proste = threading.BoundedSemaphore(self.vrsta)
+
+    def zazeni(self):
+        """
+        Vrne izvajalca bazena; če ga še ni, ga ustvari.
+        """
+        with self.kljucavnica:
+            if self.izvajalec is None:
+                self.izvajalec = ProcessPoolExecutor(self.procesi, mp_context=self.kontekst)
+            return self.izvajalec
+
+    def ogrej(self):
+        """
+        Vnaprej zažene izvajalca in prve procese bazena.
+        Kliče se ob zagonu strežnika, da prva prijava ne čaka na zagon procesov.
+        """
+        izvajalec = self.zazeni()
+        for naloga in [izvajalec.submit(os.getpid) for _ in range(self.procesi)]:
+            naloga.result()
+
+    def obnovi(self, izvajalec):
+        """
+        Zaustavi pokvarjenega izvajalca; naslednja naloga ustvari novega.
+        """
+        with self.kljucavnica:
+            if self.izvajalec is izvajalec:
+                self.izvajalec = None
+        izvajalec.shutdown(wait=False, cancel_futures=True)
+
+    def oddaj(self, izvajalec, fun, largs):
+        """
+        Nalogo odda izvajalcu in vrne njeno prihodnost.
+        Če je v bazenu že največ dovoljenih nalog, sproži PreobremenitevError.
+        """
+        if not self.proste.acquire(blocking=False):
+            raise PreobremenitevError("Preveč čakajočih izpeljav ključev.")
+        try:
+            naloga = izvajalec.submit(fun, *largs)
+        except BaseException:
+            self.proste.release()
+            raise
+        naloga.add_done_callback(lambda naloga: self.proste.release())
+        return naloga
+
+    def izvedi(self, fun, *largs):
+        """
+        Funkcijo s podanimi argumenti izvede v bazenu in vrne njen rezultat.
+        Če je bazen pokvarjen (npr. ker je bil kateri od procesov nasilno
+        končan), ga nadomesti z novim in nalogo poskusi izvesti še enkrat.
+        """
+        for poskus in range(2):
+            izvajalec = self.zazeni()
+            try:
+                naloga = self.oddaj(izvajalec, fun, largs)
+                try:
+                    return naloga.result(timeout=self.cakanje)
+                except TimeoutError:
+                    naloga.cancel()
+                    raise PreobremenitevError("Izpeljava ključa ni končala pravočasno.")
+            except BrokenProcessPool:
+                self.obnovi(izvajalec)
+                if poskus:
+                    raise
+
+
+bazen_gesel = BazenGesel(**nastavitve.get('gesla', {}))
+
+
+def sifriraj_geslo_v_ozadju(geslo):
+    """
+    Kot sifriraj_geslo, le da ključ izpelje v bazenu gesel.
+    """
+    return bazen_gesel.izvedi(sifriraj_geslo, geslo, ALGORITEM, PARAMETRI)
+
+
+def preveri_geslo_v_ozadju(geslo, zgostitev, sol):
+    """
+    Kot preveri_geslo, le da ključ izpelje v bazenu gesel.
+    """
+    return bazen_gesel.izvedi(preveri_geslo, geslo, zgostitev, sol)
+
+
+def umeri(algoritem, cilj):
+    """
+    Vrne parametre algoritma, pri katerih izpeljava ključa
+    na tem računalniku traja približno cilj sekund.
+
+    Pri PBKDF2_HMAC število ponovitev podvaja, dokler izpeljava ne traja
+    vsaj desetino cilja, nato ga sorazmerno poveča do cilja.
+    Pri scrypt podvaja parameter n, dokler ne doseže cilja.
+    """
+    sol = os.urandom(32)
+    def cas(parametri):
+        zacetek = time.perf_counter()
+        zgosti("umerjanje", sol, algoritem, parametri)
+        return time.perf_counter() - zacetek
+    parametri = dict(PRIVZETI_PARAMETRI[algoritem])
+    if algoritem == 'pbkdf2_sha256':
+        parametri['i'] = 1000
+        while (trajanje := cas(parametri)) < cilj / 10:
+            parametri['i'] *= 2
+        parametri['i'] = max(1000, int(round(parametri['i'] * cilj / trajanje, -3)))
+    else:
+        parametri['n'] = 2 ** 10
+        while cas(dict(parametri, n=2 * parametri['n'])) <= cilj:
+            parametri['n'] *= 2
+    return parametri
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Umeri ceno zgoščevanja gesel na tem računalniku.')
+    parser.add_argument('--algoritem', default=ALGORITEM, choices=sorted(ALGORITMI))
+    parser.add_argument('--cilj', type=float, default=250,
+                        help='želeni čas izpeljave ključa v milisekundah')
+    argumenti = parser.parse_args()
+    parametri = umeri(argumenti.algoritem, argumenti.cilj / 1000)
+    zacetek = time.perf_counter()
+    zgosti("umerjanje", os.urandom(32), argumenti.algoritem, parametri)
+    print("Izpeljava ključa traja {:.0f} ms.".format(
+        1000 * (time.perf_counter() - zacetek)))
+    print("V nastavitve dodajte:")
+    print(json.dumps({'zgoscevanje': {'algoritem': argumenti.algoritem,
+                                      'parametri': parametri}}))
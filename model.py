@@ -1,339 +1,1016 @@
-from pomozne_funkcije import Seznam
-import baza
-import sqlite3
-from geslo import sifriraj_geslo, preveri_geslo
-
-conn = sqlite3.connect('baza_zavetisce.db')
-baza.ustvari_bazo_ce_ne_obstaja(conn)
-conn.execute('PRAGMA foreign_keys = ON')
-
-uporabnik, cepiva, prostor, zival, oseba, posvojitev, cepljenja, namestitev = baza.pripravi_tabele(conn)
-
-
-class LoginError(Exception):
-    """
-    Napaka ob napačnem uporabniškem imenu ali geslu.
-    """
-    pass
-
-
-class Uporabnik:
-    """
-    Razred za uporabnika.
-    """
-
-    insert = uporabnik.dodajanje(["ime", "zgostitev", "sol"])
-
-    def __init__(self, ime, id=None):
-        """
-        Konstruktor uporabnika.
-        """
-        self.id = id
-        self.ime = ime
-
-    def __str__(self):
-        """
-        Znakovna predstavitev uporabnika.
-        Vrne uporabniško ime.
-        """
-        return self.ime
-
-    @staticmethod
-    def prijava(ime, geslo):
-        """
-        Preveri, ali sta uporabniško ime geslo pravilna.
-        """
-        sql = """
-            SELECT id, zgostitev, sol FROM uporabnik
-            WHERE ime = ?
-        """
-        try:
-            id, zgostitev, sol = conn.execute(sql, [ime]).fetchone()
-            if preveri_geslo(geslo, zgostitev, sol):
-                return Uporabnik(ime, id)
-        except TypeError:
-            pass
-        raise LoginError(ime)
-
-    def dodaj_v_bazo(self, geslo):
-        """
-        V bazo doda uporabnika s podanim geslom.
-        """
-        assert self.id is None
-        zgostitev, sol = sifriraj_geslo(geslo)
-        with conn:
-            self.id = uporabnik.dodaj_vrstico(
-                [self.ime, zgostitev, sol],
-                self.insert
-            )
-
-class Zival:
-    """
-    Razred za zival.
-    """
-
-    insert = zival.dodajanje(["ime", "vrsta", "spol", "dat_roj", "dat_spr", "bolezni"])
-
-    def __init__(self, ime, vrsta, spol, dat_roj, dat_spr, bolezni, id = None):
-        """
-        Konstruktor zivali.
-        """
-        self.id = id
-        self.ime = ime
-        self.vrsta = vrsta
-        self.spol = spol
-        self.dat_roj = dat_roj
-        self.dat_spr = dat_spr
-        self.bolezni = bolezni
-
-    def __str__(self):
-        """
-        Znakovna predstavitev zivali.
-        """
-        return self.vrsta + "-" + self.ime
-
-    @staticmethod
-    def najmlajsi(vrsta):
-        """
-        Vrne najmlajsih 10 zivali.
-        """
-        sql = """ SELECT * FROM zival WHERE vrsta = ? ORDER BY dat_roj DESC LIMIT 10"""
-        for id, ime, vrsta, spol, dat_roj, dat_spr, bolezni in conn.execute(sql, [vrsta]):
-            yield Zival(id, ime, vrsta, spol, dat_roj, dat_spr, bolezni)
-    def dodaj_v_bazo(self):
-        """
-        Doda osebo v bazo.
-        """
-        assert self.id is None
-        with conn:
-            self.id = zival.dodaj_vrstico([self.ime, self.vrsta, self.spol, self.dat_roj, self.dat_spr, self.bolezni], self.insert)
-    @staticmethod
-    def poisci(niz):
-        """
-        Vrne vse zivali, ki v imenu vsebujejo dani niz.
-        """
-        sql = "SELECT id, ime, vrsta, spol, dat_roj, dat_spr, bolezni from zival WHERE ime LIKE ? "
-        for id, ime, vrsta, spol, dat_roj, dat_spr, bolezni in conn.execute(sql, ['%' + niz + '%']):
-            yield Zival(id = id, ime=ime, vrsta=vrsta, spol=spol, dat_roj = dat_roj, dat_spr= dat_spr, bolezni=bolezni)
-
-    @staticmethod
-    def obst(niz):
-        """
-        Vrne zival z id niz.
-        """
-        sql = "SELECT * from zival WHERE id = ? "
-        for id, ime, vrsta, spol, dat_roj, dat_spr, bolezni in conn.execute(sql, [niz]):
-            yield Zival(id = id, ime=ime, vrsta=vrsta, spol=spol, dat_roj = dat_roj, dat_spr= dat_spr, bolezni=bolezni)
-    @staticmethod
-    def posvojena(niz):
-        """
-        Vrne zival ce je posvojena.
-        """
-        sql = "SELECT zival.id, ime, vrsta, spol, dat_roj, dat_spr, bolezni from posvojitev, zival  WHERE zival.id = id_z AND zival.id = ? "
-        for id, ime, vrsta, spol, dat_roj, dat_spr, bolezni in conn.execute(sql, [niz]):
-            yield Zival(id = id, ime=ime, vrsta=vrsta, spol=spol, dat_roj = dat_roj, dat_spr= dat_spr, bolezni=bolezni)
-    @staticmethod
-    def odstrani_nah(id):
-        """
-        Žival odstrani iz nahajalisca.
-        """
-        odstrani_nah = "DELETE from namestitev WHERE id_z = ? "
-        conn.execute(odstrani_nah, [id])
-    @staticmethod
-    def nahajalisce(id):
-        """
-        Žival nahajališče.
-        """
-        sql = "SELECT id_p, zasedenost, oddelek, kapaciteta from namestitev JOIN prostor ON namestitev.id_p = prostor.id WHERE id_z = ? "
-        for id_p, zasedenost, oddelek, kapaciteta in conn.execute(sql, [id]):
-            yield Prostor(id=id_p, oddelek =oddelek, kapaciteta = kapaciteta, zasedenost = zasedenost)
-    @staticmethod
-    def namesti(id_z, id_p):
-        """
-        Žival namesti.
-        """
-        sql = "INSERT INTO namestitev (id_z, id_p) VALUES (?, ?)"
-        conn.execute(sql, [id_z, id_p])
-            
-           
-
-class Oseba:
-    """
-    Razred za osebo.
-    """
-
-    insert = oseba.dodajanje(["ime", "priimek", "mail"])
-    def __init__(self, ime, priimek, mail, id=None):
-        """
-        Konstruktor osebe.
-        """
-        self.id = id
-        self.ime = ime
-        self.priimek = priimek
-        self.mail = mail
-
-    def __str__(self):
-        """
-        Znakovna predstavitev osebe.
-        Vrne ime osebe.
-        """
-        return self.ime
-
-
-    @staticmethod
-    def poisci(niz):
-        """
-        Vrne vse osebe, ki v imenu vsebujejo dani niz.
-        """
-        sql = "SELECT id, ime, priimek, mail FROM oseba WHERE ime LIKE ? OR priimek LIKE ?"
-        for id, ime, priimek, mail in conn.execute(sql, ['%' + niz + '%', '%' + niz + '%']):
-            yield Oseba(ime=ime, id=id, priimek=priimek, mail=mail)
-   
-    def dodaj_v_bazo(self):
-        """
-        Doda osebo v bazo.
-        """
-        assert self.id is None
-        with conn:
-            self.id = oseba.dodaj_vrstico([self.ime, self.priimek, self.mail], self.insert)
-    @staticmethod
-    def obst(niz):
-        """
-        Vrne osebo z id niz.
-        """
-        sql = "SELECT * from oseba WHERE id = ? "
-        for id, ime, priimek, mail in conn.execute(sql, [niz]):
-            yield Oseba(id = id, ime=ime, priimek = priimek, mail = mail)
-
-
-class Prostor:
-    """
-    Razred za prostor.
-    """
-    def __init__(self, id, oddelek, kapaciteta, zasedenost):
-        """
-        Konstruktor osebe.
-        """
-        self.id = id
-        self.oddelek = oddelek
-        self.kapaciteta = kapaciteta
-        self.zasedenost = zasedenost
-
-    def __str__(self):
-        """
-        Znakovna predstavitev osebe.
-        Vrne ime osebe.
-        """
-        return self.id
-    @staticmethod
-    def aliJeProstor(vrsta):
-        """
-        Ali je prostor za vrsto živali vrsta.
-        """
-        sql = "SELECT * FROM prostor WHERE oddelek = ? AND kapaciteta > zasedenost"
-        for id, oddelek, kapaciteta, zasedenost in conn.execute(sql, [vrsta]):
-            yield Prostor(id=id, oddelek = oddelek, kapaciteta = kapaciteta, zasedenost = zasedenost)
-    @staticmethod
-    def napolni_izprazni(zasedenost, id):
-        """
-        Napolni prostor.
-        """
-        sql_update = "UPDATE prostor SET zasedenost = ?  WHERE id = ?"
-        conn.execute(sql_update, [zasedenost, id])
-    @staticmethod
-    def vsi():
-        """
-        Vrne vse prostore
-        """
-        sql = "SELECT * FROM prostor"
-        for id, oddelek, kapaciteta, zasedenost in conn.execute(sql, []):
-            yield Prostor(id=id, oddelek = oddelek, kapaciteta = kapaciteta, zasedenost = zasedenost)
-   
-    
-class Namestitev:
-    """
-    Razred za nam.
-    """
-    def __init__(self, id_z, id_p):
-        """
-        Konstruktor.
-        """
-        self.id_z = id_z
-        self.id_p = id_p
-    @staticmethod
-    def vsi():
-        """
-        Vrne vse namestitve
-        """
-        sql = "SELECT * FROM namestitev"
-        for id_z, id_p in conn.execute(sql, []):
-            yield Namestitev(id_z=id_z, id_p = id_p)
-        
-#cepljenja
-class Cepljenja:
-    """
-    Razred za cep.
-    """
-
-    insert = cepljenja.dodajanje(["id_z", "id_c"])
-    def __init__(self, id_z, id_c, id=None):
-        """
-        Konstruktor cep.
-        """
-        self.id = id
-        self.id_z = id_z
-        self.id_c = id_c
-
-    def __str__(self):
-        """
-        Znakovna predstavitev cep.
-        """
-        return self.id_z + "-" + self.id_c
-
-    def dodaj_v_bazo(self):
-        """
-        Doda cep v bazo.
-        """
-        assert self.id is None
-        with conn:
-            self.id = cepljenja.dodaj_vrstico([self.id_z, self.id_c], self.insert)
-
-    @staticmethod
-    def vsa():
-        """
-        Vrne vsa cepljenja
-        """
-        sql = "SELECT * FROM cepljenja"
-        for id, id_z, id_c in conn.execute(sql, []):
-            yield Cepljenja(id=id, id_z = id_z, id_c = id_c)
-    
-    #posvojitev
-class Posvojitev:
-    """
-    Razred za pos.
-    """
-    insert = posvojitev.dodajanje(["id_z", "id_o", "datum"])
-    def __init__(self, id_z, id_o, datum, id=None):
-        """
-        Konstruktor pos.
-        """
-        self.id = id
-        self.id_z = id_z
-        self.id_o = id_o
-        self.datum = datum
-
-    def __str__(self):
-        """
-        Znakovna predstavitev pos.
-        """
-        return self.id_z + "-" + self.id_o
-
-    def dodaj_v_bazo(self):
-        """
-        Doda cep v bazo.
-        """
-        assert self.id is None
-        with conn:
-            self.id = posvojitev.dodaj_vrstico([self.id_z, self.id_o, self.datum], self.insert)
-
-
+from pomozne_funkcije import Seznam, normaliziraj, normaliziraj_datum
+import baza
+import json
+import os
+import sqlite3
+from geslo import sifriraj_geslo_v_ozadju, preveri_geslo_v_ozadju, zastarela, PreobremenitevError
+from nastavitve import nastavitve
+from predpomnilnik import Predpomnilnik, LRUPredpomnilnik
+from razporejevalnik import Razporejevalnik
+
+bazen = baza.Bazen('baza_zavetisce.db', pragme=nastavitve.get('sqlite'),
+                    **nastavitve.get('bazen', {}))
+conn = baza.Povezava(bazen)
+
+uporabnik, cepiva, prostor, zival, oseba, posvojitev, cepljenja, namestitev, \
+    namescenost, precepljenost, seja = baza.pripravi_tabele(conn)
+
+NA_STRAN = 50
+
+razporejevalnik = Razporejevalnik(nastavitve.get('razporejanje', 'prvi'))
+predpomnilnik_prostorov = Predpomnilnik(bazen)
+predpomnilnik_iskanja = LRUPredpomnilnik(**nastavitve.get('predpomnilnik_iskanja', {}))
+
+
+def pripravi_bazo():
+    """
+    Ustvari bazo, če še ne obstaja, sicer jo posodobi.
+
+    Kliče se ob zagonu programa in ne ob uvozu modula,
+    zato model lahko uvozijo tudi procesi bazena gesel,
+    ne da bi dostopali do baze.
+    """
+    baza.ustvari_bazo_ce_ne_obstaja(conn)
+    bazen.vrni()
+
+
+def iskalni_izraz(niz):
+    """
+    Iz iskalnega niza sestavi poizvedbo za iskalni indeks FTS5.
+
+    Iskalni niz normalizira tako kot iskalne ključe v bazi.
+    Vsaka beseda postane svoja fraza, zato se morajo ujemati vse besede.
+    Trigramski indeks najde le podnize z vsaj tremi znaki,
+    zato za krajše besede vrne None.
+    """
+    besede = normaliziraj(niz).split()
+    if not besede or any(len(beseda) < 3 for beseda in besede):
+        return None
+    return " ".join('"{}"'.format(beseda.replace('"', '""')) for beseda in besede)
+
+
+def vzorec_podniza(niz):
+    """
+    Vrne vzorec LIKE (z ubežnim znakom \\) za iskanje normaliziranih ključev,
+    ki vsebujejo dani niz.
+    """
+    podniz = normaliziraj(niz).strip()
+    for znak in "\\%_":
+        podniz = podniz.replace(znak, "\\" + znak)
+    return "%" + podniz + "%"
+
+
+class Stran:
+    """
+    Stran rezultatov pri listanju po ključu.
+
+    Po stran iteriramo kot po rezultatih poizvedbe.
+    Polji prejsnja in naslednja sta ključa za parametra before_id in after_id
+    sosednjih strani (ali None, če strani ni) in sta znana,
+    ko se stran prebere do konca.
+    Pri ključu iz več stolpcev sta ključa nabora.
+    """
+
+    def __init__(self, vrstice, izdelaj, limit=None, after_id=None, before_id=None,
+                 stolpcev=1):
+        """
+        Konstruktor strani.
+
+        Argumenti:
+        - vrstice: vrstice poizvedbe s ključem v prvih stolpcih;
+          pri before_id so urejene padajoče, sicer naraščajoče
+        - izdelaj: funkcija, ki iz stolpcev vrstice naredi objekt;
+          dobi vse stolpce razen tistih stolpcev ključa, ki so pred zadnjim
+        - limit: največje število elementov na strani ali None
+        - after_id, before_id: ključ, za katerim oziroma pred katerim se
+          stran začne
+        - stolpcev: število stolpcev ključa
+        """
+        self.vrstice = vrstice
+        self.izdelaj = izdelaj
+        self.limit = limit
+        self.after_id = after_id
+        self.before_id = before_id
+        self.stolpcev = stolpcev
+        self.prejsnja = None
+        self.naslednja = None
+
+    def kljuc(self, vrstica):
+        """
+        Vrne ključ vrstice.
+        """
+        if self.stolpcev == 1:
+            return vrstica[0]
+        return tuple(vrstica[:self.stolpcev])
+
+    def __iter__(self):
+        """
+        Vrača elemente strani.
+        """
+        if self.before_id is not None:
+            vrstice = list(self.vrstice)
+            if len(vrstice) > self.limit:
+                vrstice = vrstice[:self.limit]
+                self.prejsnja = self.kljuc(vrstice[-1])
+            vrstice.reverse()
+            if vrstice:
+                self.naslednja = self.kljuc(vrstice[-1])
+        else:
+            vrstice = self.vrstice
+        for i, vrstica in enumerate(vrstice):
+            if i == 0 and self.after_id is not None:
+                self.prejsnja = self.kljuc(vrstica)
+            if self.before_id is None and self.limit is not None and i == self.limit:
+                self.naslednja = self.kljuc(zadnja)
+                break
+            zadnja = vrstica
+            yield self.izdelaj(*vrstica[self.stolpcev - 1:])
+
+
+def zapisi_kljuc(kljuc):
+    """
+    Ključ strani zapiše tako, kot se poda v parametru after_id ali before_id.
+    Nabor zapiše kot z vejicami ločene vrednosti, ostale ključe vrne nespremenjene.
+    """
+    if isinstance(kljuc, tuple):
+        return ",".join(repr(vrednost) for vrednost in kljuc)
+    return kljuc
+
+
+def razberi_kljuc(niz):
+    """
+    Iz parametra after_id ali before_id prebere ključ strani.
+    Z vejicami ločene vrednosti vrne kot nabor števil.
+    Ob neveljavnem nizu sproži ValueError.
+    """
+    def stevilo(vrednost):
+        try:
+            return int(vrednost)
+        except ValueError:
+            return float(vrednost)
+    vrednosti = [stevilo(vrednost) for vrednost in niz.split(",")]
+    if len(vrednosti) == 1:
+        return vrednosti[0]
+    return tuple(vrednosti)
+
+
+def listaj(sql, parametri, izdelaj, kljuc="id", after_id=None, before_id=None,
+           limit=None, vrstni_red=None, predpomnilnik=None):
+    """
+    Izvede poizvedbo z listanjem po ključu (seek method) in vrne Stran.
+
+    Poizvedbo dopolni s pogojem za ključ in jo uredi po ključu,
+    zato je vsaka stran enako draga.
+    Ključ mora biti prvi stolpec poizvedbe. Ključ je lahko tudi nabor
+    izrazov, npr. (ustreznost, id); tedaj so izrazi prvi stolpci poizvedbe,
+    zadnji med njimi pa je prvi stolpec, ki ga dobi funkcija izdelaj.
+    Če listanje ni zahtevano, vrne vse vrstice, urejene po vrstnem redu
+    vrstni_red (če je podan).
+    Če je podan predpomnilnik, vrstice prebere skozenj.
+    """
+    def izvedi(sql, parametri):
+        if predpomnilnik is None:
+            return conn.execute(sql, parametri)
+        return predpomnilnik.preberi((sql, tuple(parametri)),
+                                     lambda: conn.execute(sql, parametri).fetchall())
+
+    kljuci = kljuc if isinstance(kljuc, tuple) else (kljuc, )
+    stolpcev = len(kljuci)
+    if limit is None and after_id is None and before_id is None:
+        if vrstni_red is not None:
+            sql += " ORDER BY " + vrstni_red
+        return Stran(izvedi(sql, parametri), izdelaj, stolpcev=stolpcev)
+    meje = {}
+    for ime, meja in (("after_id", after_id), ("before_id", before_id)):
+        if meja is not None:
+            meje[ime] = list(meja) if isinstance(meja, tuple) else [meja]
+            if len(meje[ime]) != stolpcev:
+                raise ValueError("Neveljaven ključ strani: {}".format(zapisi_kljuc(meja)))
+    if stolpcev > 1:
+        kljuc = "({})".format(", ".join(kljuci))
+        oznake = "({})".format(", ".join("?" * stolpcev))
+    else:
+        oznake = "?"
+    limit = NA_STRAN if limit is None else max(1, limit)
+    veznik = " AND " if " WHERE " in sql.upper() else " WHERE "
+    if before_id is not None:
+        sql += "{}{} < {} ORDER BY {} LIMIT ?".format(
+            veznik, kljuc, oznake, ", ".join(k + " DESC" for k in kljuci))
+        parametri = list(parametri) + meje["before_id"] + [limit + 1]
+    elif after_id is not None:
+        sql += "{}{} > {} ORDER BY {} LIMIT ?".format(
+            veznik, kljuc, oznake, ", ".join(kljuci))
+        parametri = list(parametri) + meje["after_id"] + [limit + 1]
+    else:
+        sql += " ORDER BY {} LIMIT ?".format(", ".join(kljuci))
+        parametri = list(parametri) + [limit + 1]
+    return Stran(izvedi(sql, parametri), izdelaj, limit, after_id, before_id, stolpcev)
+
+
+def filtriraj(sql, pogoji, filtri):
+    """
+    Poizvedbo dopolni s pogoji za podane filtre.
+    Vrne par (poizvedba, parametri).
+    Ob neznanem filtru ali neveljavni vrednosti sproži ValueError.
+
+    Argumenti:
+    - sql: poizvedba brez pogojev
+    - pogoji: slovar, ki imenu filtra priredi par
+      (pogoj z enim parametrom, funkcija za pretvorbo vrednosti)
+    - filtri: slovar vrednosti filtrov; filtri z vrednostjo None
+      se ne upoštevajo
+    """
+    izbrani = [(ime, vrednost) for ime, vrednost in filtri.items() if vrednost is not None]
+    for ime, _ in izbrani:
+        if ime not in pogoji:
+            raise ValueError("Neznan filter: {}".format(ime))
+    parametri = []
+    for ime, vrednost in izbrani:
+        try:
+            parametri.append(pogoji[ime][1](vrednost))
+        except ValueError:
+            raise ValueError("Neveljavna vrednost filtra {}: {}".format(ime, vrednost))
+    if izbrani:
+        sql += " WHERE " + " AND ".join(pogoji[ime][0] for ime, _ in izbrani)
+    return sql, parametri
+
+
+class LoginError(Exception):
+    """
+    Napaka ob napačnem uporabniškem imenu ali geslu.
+    """
+    pass
+
+
+class Uporabnik:
+    """
+    Razred za uporabnika.
+    """
+
+    insert = uporabnik.dodajanje(["ime", "zgostitev", "sol"])
+    sql_prezgosti = "UPDATE uporabnik SET zgostitev = ?, sol = ? WHERE id = ? AND zgostitev = ?"
+    lazna = None
+
+    def __init__(self, ime, id=None):
+        """
+        Konstruktor uporabnika.
+        """
+        self.id = id
+        self.ime = ime
+
+    def __str__(self):
+        """
+        Znakovna predstavitev uporabnika.
+        Vrne uporabniško ime.
+        """
+        return self.ime
+
+    @staticmethod
+    def prijava(ime, geslo):
+        """
+        Preveri, ali sta uporabniško ime geslo pravilna.
+        Geslo se preveri v bazenu gesel; ob preobremenitvi
+        se sproži PreobremenitevError.
+        Če je zgostitev gesla zastarela, jo ob uspešni prijavi
+        nadomesti zgostitev z nastavljenim algoritmom in parametri.
+        Za neobstoječega uporabnika se geslo preveri proti lažni
+        zgostitvi, da odgovor ne traja opazno manj časa.
+        """
+        sql = """
+            SELECT id, zgostitev, sol FROM uporabnik
+            WHERE ime = ?
+        """
+        vrstica = conn.execute(sql, [ime]).fetchone()
+        if vrstica is None:
+            preveri_geslo_v_ozadju(geslo, *Uporabnik.lazna_zgostitev())
+            raise LoginError(ime)
+        id, zgostitev, sol = vrstica
+        if not preveri_geslo_v_ozadju(geslo, zgostitev, sol):
+            raise LoginError(ime)
+        if zastarela(zgostitev):
+            Uporabnik.prezgosti(id, geslo, zgostitev)
+        return Uporabnik(ime, id)
+
+    @staticmethod
+    def lazna_zgostitev():
+        """
+        Vrne par (zgostitev, sol) naključnega gesla,
+        zgoščenega z nastavljenim algoritmom in parametri.
+        """
+        if Uporabnik.lazna is None:
+            Uporabnik.lazna = sifriraj_geslo_v_ozadju(os.urandom(16).hex())
+        return Uporabnik.lazna
+
+    @staticmethod
+    def prezgosti(id, geslo, stara):
+        """
+        Geslo uporabnika zgosti na novo, če se zgostitev v bazi
+        medtem ni spremenila.
+        Če je bazen gesel preobremenjen, zgostitev pusti za naslednjo prijavo.
+        """
+        try:
+            zgostitev, sol = sifriraj_geslo_v_ozadju(geslo)
+        except PreobremenitevError:
+            return
+        with conn:
+            conn.execute(Uporabnik.sql_prezgosti, [zgostitev, sol, id, stara])
+
+    def dodaj_v_bazo(self, geslo):
+        """
+        V bazo doda uporabnika s podanim geslom.
+        Geslo se zgosti v bazenu gesel; ob preobremenitvi
+        se sproži PreobremenitevError.
+        """
+        assert self.id is None
+        zgostitev, sol = sifriraj_geslo_v_ozadju(geslo)
+        with conn:
+            self.id = uporabnik.dodaj_vrstico(
+                [self.ime, zgostitev, sol],
+                self.insert
+            )
+
+class Zival:
+    """
+    Razred za zival.
+    """
+
+    insert = zival.dodajanje(["ime", "vrsta", "spol", "dat_roj", "dat_spr", "bolezni", "ime_kljuc"])
+    insert_z_id = zival.dodajanje(["id", "ime", "vrsta", "spol", "dat_roj", "dat_spr", "bolezni", "ime_kljuc"])
+    sql_najvecji_id = "SELECT COALESCE(MAX(id), 0) FROM zival"
+    sql_najmlajsi = "SELECT id, ime, vrsta, spol, dat_roj, dat_spr, bolezni FROM zival WHERE vrsta = ? ORDER BY dat_roj DESC LIMIT 10"
+    sql_posvojena = "SELECT zival.id, ime, vrsta, spol, dat_roj, dat_spr, bolezni from posvojitev, zival  WHERE zival.id = id_z AND zival.id = ? "
+    sql_odstrani_nah = "DELETE from namestitev WHERE id_z = ? RETURNING id_p"
+    sql_nahajalisce = "SELECT id_p, zasedenost, oddelek, kapaciteta from namestitev JOIN prostor ON namestitev.id_p = prostor.id WHERE id_z = ? "
+    sql_namesti = "INSERT INTO namestitev (id_z, id_p) VALUES (?, ?)"
+    sql_poisci = """
+        SELECT zival_iskanje.rank, zival.id, zival.ime, vrsta, spol, dat_roj, dat_spr, bolezni
+        FROM zival_iskanje JOIN zival ON zival.id = zival_iskanje.rowid
+        WHERE zival_iskanje MATCH ?
+    """
+    sql_poisci_kratko = "SELECT id, ime, vrsta, spol, dat_roj, dat_spr, bolezni from zival WHERE ime_kljuc LIKE ? ESCAPE '\\' "
+    sql_rojene = "SELECT id, ime, vrsta, spol, dat_roj, dat_spr, bolezni FROM zival WHERE dat_roj >= ? AND dat_roj < ? "
+    sql_sprejete = "SELECT id, ime, vrsta, spol, dat_roj, dat_spr, bolezni FROM zival WHERE dat_spr >= ? AND dat_spr < ? "
+    sql_vse = "SELECT id, ime, vrsta, spol, dat_roj, dat_spr, bolezni FROM zival"
+    pogoji = {
+        "vrsta": ("vrsta = ?", str),
+        "spol": ("spol = ?", str),
+        "rojena_od": ("dat_roj >= ?", normaliziraj_datum),
+        "rojena_do": ("dat_roj < ?", normaliziraj_datum),
+        "sprejeta_od": ("dat_spr >= ?", normaliziraj_datum),
+        "sprejeta_do": ("dat_spr < ?", normaliziraj_datum),
+    }
+
+    def __init__(self, ime, vrsta, spol, dat_roj, dat_spr, bolezni, id = None):
+        """
+        Konstruktor zivali.
+        """
+        self.id = id
+        self.ime = ime
+        self.vrsta = vrsta
+        self.spol = spol
+        self.dat_roj = dat_roj
+        self.dat_spr = dat_spr
+        self.bolezni = bolezni
+
+    def __str__(self):
+        """
+        Znakovna predstavitev zivali.
+        """
+        return self.vrsta + "-" + self.ime
+
+    def vrstica(self):
+        """
+        Vrne podatke o živali za vstavljanje v tabelo zival.
+        Datume pretvori v obliko ISO 8601 in doda iskalni ključ imena.
+        Ob neveljavnem datumu sproži ValueError.
+        """
+        return [self.ime, self.vrsta, self.spol, normaliziraj_datum(self.dat_roj),
+                normaliziraj_datum(self.dat_spr), self.bolezni, normaliziraj(self.ime)]
+
+    @staticmethod
+    def najmlajsi(vrsta):
+        """
+        Vrne najmlajsih 10 zivali.
+        """
+        for id, ime, vrsta, spol, dat_roj, dat_spr, bolezni in conn.execute(Zival.sql_najmlajsi, [vrsta]):
+            yield Zival(id = id, ime=ime, vrsta=vrsta, spol=spol, dat_roj = dat_roj, dat_spr= dat_spr, bolezni=bolezni)
+
+    @staticmethod
+    def rojene(od, do, after_id=None, before_id=None, limit=None):
+        """
+        Vrne stran zivali, rojenih na dan od ali kasneje in pred dnem do,
+        urejenih po id.
+        """
+        return listaj(Zival.sql_rojene, [normaliziraj_datum(od), normaliziraj_datum(do)],
+                      lambda id, ime, vrsta, spol, dat_roj, dat_spr, bolezni:
+                      Zival(id = id, ime=ime, vrsta=vrsta, spol=spol, dat_roj = dat_roj, dat_spr= dat_spr, bolezni=bolezni),
+                      "id", after_id, before_id, limit, vrstni_red="id")
+
+    @staticmethod
+    def sprejete(od, do, after_id=None, before_id=None, limit=None):
+        """
+        Vrne stran zivali, sprejetih na dan od ali kasneje in pred dnem do,
+        urejenih po id.
+        """
+        return listaj(Zival.sql_sprejete, [normaliziraj_datum(od), normaliziraj_datum(do)],
+                      lambda id, ime, vrsta, spol, dat_roj, dat_spr, bolezni:
+                      Zival(id = id, ime=ime, vrsta=vrsta, spol=spol, dat_roj = dat_roj, dat_spr= dat_spr, bolezni=bolezni),
+                      "id", after_id, before_id, limit, vrstni_red="id")
+
+    @staticmethod
+    def vse(after_id=None, before_id=None, limit=None, **filtri):
+        """
+        Vrne stran zivali, ki ustrezajo filtrom iz slovarja Zival.pogoji,
+        urejenih po id.
+        """
+        sql, parametri = filtriraj(Zival.sql_vse, Zival.pogoji, filtri)
+        return listaj(sql, parametri,
+                      lambda id, ime, vrsta, spol, dat_roj, dat_spr, bolezni:
+                      Zival(id = id, ime=ime, vrsta=vrsta, spol=spol, dat_roj = dat_roj, dat_spr= dat_spr, bolezni=bolezni),
+                      "id", after_id, before_id, limit, vrstni_red="id")
+
+    @predpomnilnik_prostorov.razveljavi_po
+    @predpomnilnik_iskanja.razveljavi_po
+    @baza.ponovi_ob_zaklepu()
+    def sprejmi(self):
+        """
+        Žival sprejme v zavetišče.
+
+        V eni transakciji žival doda v bazo in jo namesti v prostor
+        za njeno vrsto, ki ga izbere razporejevalnik.
+        Zasedenost prostora povečajo sprožilci na tabeli namestitev.
+        Vrne id prostora ali None, če prostora ni.
+        """
+        assert self.id is None
+        try:
+            with baza.transakcija(conn):
+                id = zival.dodaj_vrstico(self.vrstica(), self.insert)
+                id_p = Zival.namesti_prosto(id, self.vrsta)
+                if id_p is None:
+                    conn.rollback()
+                    return None
+        except BaseException:
+            razporejevalnik.nalozen = False
+            raise
+        self.id = id
+        return id_p
+
+    @staticmethod
+    @predpomnilnik_prostorov.razveljavi_po
+    @predpomnilnik_iskanja.razveljavi_po
+    @baza.ponovi_ob_zaklepu()
+    def sprejmi_paket(zivali):
+        """
+        Več živali hkrati sprejme v zavetišče.
+
+        Razporejevalnik v enem prehodu dodeli prostore vsem živalim,
+        nato se v eni transakciji z executemany vstavijo živali
+        z vnaprej določenimi id-ji in njihove namestitve.
+        Živali, za katere ni prostora, se ne vstavijo.
+        Vrne seznam id-jev prostorov v enakem vrstnem redu kot živali;
+        kjer prostora ni, je na seznamu None.
+        """
+        assert all(z.id is None for z in zivali)
+        try:
+            with baza.transakcija(conn):
+                for poskus in range(2):
+                    if poskus or not razporejevalnik.nalozen:
+                        razporejevalnik.nalozi(conn)
+                    prostori = razporejevalnik.dodeli_paket([z.vrsta for z in zivali])
+                    if poskus == 0 and None in prostori:
+                        continue
+                    sprejete = [(z, id_p) for z, id_p in zip(zivali, prostori) if id_p is not None]
+                    prvi_id = conn.execute(Zival.sql_najvecji_id).fetchone()[0] + 1
+                    conn.execute("SAVEPOINT sprejem")
+                    try:
+                        conn.executemany(Zival.insert_z_id, (
+                            [prvi_id + i] + z.vrstica()
+                            for i, (z, id_p) in enumerate(sprejete)))
+                        conn.executemany(Zival.sql_namesti, (
+                            [prvi_id + i, id_p] for i, (z, id_p) in enumerate(sprejete)))
+                    except sqlite3.IntegrityError:
+                        conn.execute("ROLLBACK TO sprejem")
+                        if poskus:
+                            raise
+                        continue
+                    conn.execute("RELEASE sprejem")
+                    break
+        except BaseException:
+            razporejevalnik.nalozen = False
+            raise
+        for i, (z, id_p) in enumerate(sprejete):
+            z.id = prvi_id + i
+        return prostori
+
+    @staticmethod
+    def namesti_prosto(id_z, vrsta):
+        """
+        Žival namesti v prostor, ki ga izbere razporejevalnik.
+
+        Klicati jo je treba znotraj transakcije, ki je bazo že zaklenila
+        za pisanje.
+        Če baza prostor zavrne ali razporejevalnik prostora ne najde,
+        razporejevalnik enkrat znova naloži iz baze in poskusi še enkrat.
+        Vrne id prostora ali None, če prostora ni.
+        """
+        for poskus in range(2):
+            if poskus or not razporejevalnik.nalozen:
+                razporejevalnik.nalozi(conn)
+            id_p = razporejevalnik.dodeli(vrsta)
+            if id_p is None:
+                continue
+            try:
+                Zival.namesti(id_z, id_p)
+            except sqlite3.IntegrityError:
+                continue
+            return id_p
+        return None
+
+    @predpomnilnik_iskanja.razveljavi_po
+    def dodaj_v_bazo(self):
+        """
+        Doda osebo v bazo.
+        """
+        assert self.id is None
+        with conn:
+            self.id = zival.dodaj_vrstico(self.vrstica(), self.insert)
+    @staticmethod
+    def poisci(niz, after_id=None, before_id=None, limit=None):
+        """
+        Vrne stran zivali, ki v imenu vsebujejo dani niz.
+        Velike črke in strešice se ne upoštevajo.
+        Niz z besedo, krajšo od treh znakov, ki je iskalni indeks ne najde,
+        se išče kot podniz normaliziranega imena.
+        Zadetki iz iskalnega indeksa so urejeni po ustreznosti in id,
+        listanje pa poteka po paru (ustreznost, id);
+        zadetki kratkih nizov so urejeni po id.
+        Zadetki se berejo skozi predpomnilnik iskanja.
+        """
+        izdelaj = lambda id, ime, vrsta, spol, dat_roj, dat_spr, bolezni: \
+            Zival(id = id, ime=ime, vrsta=vrsta, spol=spol, dat_roj = dat_roj, dat_spr= dat_spr, bolezni=bolezni)
+        izraz = iskalni_izraz(niz)
+        if izraz is None:
+            return listaj(Zival.sql_poisci_kratko, [vzorec_podniza(niz)], izdelaj,
+                          "id", after_id, before_id, limit, vrstni_red="id",
+                          predpomnilnik=predpomnilnik_iskanja)
+        return listaj(Zival.sql_poisci, [izraz], izdelaj,
+                      ("zival_iskanje.rank", "zival_iskanje.rowid"),
+                      after_id, before_id, limit,
+                      vrstni_red="zival_iskanje.rank, zival_iskanje.rowid",
+                      predpomnilnik=predpomnilnik_iskanja)
+
+    @staticmethod
+    def obst(niz):
+        """
+        Vrne zival z id niz.
+        """
+        sql = "SELECT id, ime, vrsta, spol, dat_roj, dat_spr, bolezni from zival WHERE id = ? "
+        for id, ime, vrsta, spol, dat_roj, dat_spr, bolezni in conn.execute(sql, [niz]):
+            yield Zival(id = id, ime=ime, vrsta=vrsta, spol=spol, dat_roj = dat_roj, dat_spr= dat_spr, bolezni=bolezni)
+    @staticmethod
+    def posvojena(niz):
+        """
+        Vrne zival ce je posvojena.
+        """
+        for id, ime, vrsta, spol, dat_roj, dat_spr, bolezni in conn.execute(Zival.sql_posvojena, [niz]):
+            yield Zival(id = id, ime=ime, vrsta=vrsta, spol=spol, dat_roj = dat_roj, dat_spr= dat_spr, bolezni=bolezni)
+    @staticmethod
+    @predpomnilnik_prostorov.razveljavi_po
+    def odstrani_nah(id):
+        """
+        Žival odstrani iz nahajalisca.
+        Zasedenost prostora zmanjšajo sprožilci na tabeli namestitev.
+        """
+        with conn:
+            prostori = [id_p for id_p, in conn.execute(Zival.sql_odstrani_nah, [id])]
+        for id_p in prostori:
+            razporejevalnik.sprosti(id_p)
+    @staticmethod
+    def nahajalisce(id):
+        """
+        Žival nahajališče.
+        """
+        for id_p, zasedenost, oddelek, kapaciteta in conn.execute(Zival.sql_nahajalisce, [id]):
+            yield Prostor(id=id_p, oddelek =oddelek, kapaciteta = kapaciteta, zasedenost = zasedenost)
+    @staticmethod
+    @predpomnilnik_prostorov.razveljavi_po
+    def namesti(id_z, id_p):
+        """
+        Žival namesti.
+        """
+        conn.execute(Zival.sql_namesti, [id_z, id_p])
+            
+           
+
+class Oseba:
+    """
+    Razred za osebo.
+    """
+
+    insert = oseba.dodajanje(["ime", "priimek", "mail", "ime_kljuc", "priimek_kljuc"])
+    sql_poisci = """
+        SELECT oseba_iskanje.rank, oseba.id, oseba.ime, oseba.priimek, oseba.mail
+        FROM oseba_iskanje JOIN oseba ON oseba.id = oseba_iskanje.rowid
+        WHERE oseba_iskanje MATCH ?
+    """
+    sql_poisci_kratko = "SELECT id, ime, priimek, mail FROM oseba WHERE (ime_kljuc LIKE ? ESCAPE '\\' OR priimek_kljuc LIKE ? ESCAPE '\\' OR mail LIKE ? ESCAPE '\\')"
+    sql_vse = "SELECT id, ime, priimek, mail FROM oseba"
+    pogoji = {
+        "mail": ("mail = ?", str),
+    }
+
+    def __init__(self, ime, priimek, mail, id=None):
+        """
+        Konstruktor osebe.
+        """
+        self.id = id
+        self.ime = ime
+        self.priimek = priimek
+        self.mail = mail
+
+    def __str__(self):
+        """
+        Znakovna predstavitev osebe.
+        Vrne ime osebe.
+        """
+        return self.ime
+
+
+    @staticmethod
+    def poisci(niz, after_id=None, before_id=None, limit=None):
+        """
+        Vrne stran oseb, ki v imenu, priimku ali e-naslovu vsebujejo dani niz.
+        Velike črke in strešice se ne upoštevajo.
+        Niz z besedo, krajšo od treh znakov, ki je iskalni indeks ne najde,
+        se išče kot podniz normaliziranega imena, priimka ali e-naslova.
+        Zadetki iz iskalnega indeksa so urejeni po ustreznosti in id,
+        listanje pa poteka po paru (ustreznost, id);
+        zadetki kratkih nizov so urejeni po id.
+        Zadetki se berejo skozi predpomnilnik iskanja.
+        """
+        izdelaj = lambda id, ime, priimek, mail: \
+            Oseba(ime=ime, id=id, priimek=priimek, mail=mail)
+        izraz = iskalni_izraz(niz)
+        if izraz is None:
+            return listaj(Oseba.sql_poisci_kratko, [vzorec_podniza(niz)] * 3, izdelaj,
+                          "id", after_id, before_id, limit, vrstni_red="id",
+                          predpomnilnik=predpomnilnik_iskanja)
+        return listaj(Oseba.sql_poisci, [izraz], izdelaj,
+                      ("oseba_iskanje.rank", "oseba_iskanje.rowid"),
+                      after_id, before_id, limit,
+                      vrstni_red="oseba_iskanje.rank, oseba_iskanje.rowid",
+                      predpomnilnik=predpomnilnik_iskanja)
+
+    @staticmethod
+    def vse(after_id=None, before_id=None, limit=None, **filtri):
+        """
+        Vrne stran oseb, ki ustrezajo filtrom iz slovarja Oseba.pogoji,
+        urejenih po id.
+        """
+        sql, parametri = filtriraj(Oseba.sql_vse, Oseba.pogoji, filtri)
+        return listaj(sql, parametri, lambda id, ime, priimek, mail:
+                      Oseba(ime=ime, id=id, priimek=priimek, mail=mail),
+                      "id", after_id, before_id, limit, vrstni_red="id")
+   
+    @predpomnilnik_iskanja.razveljavi_po
+    def dodaj_v_bazo(self):
+        """
+        Doda osebo v bazo.
+        """
+        assert self.id is None
+        with conn:
+            self.id = oseba.dodaj_vrstico([self.ime, self.priimek, self.mail, normaliziraj(self.ime), normaliziraj(self.priimek)], self.insert)
+    @staticmethod
+    def obst(niz):
+        """
+        Vrne osebo z id niz.
+        """
+        sql = "SELECT id, ime, priimek, mail from oseba WHERE id = ? "
+        for id, ime, priimek, mail in conn.execute(sql, [niz]):
+            yield Oseba(id = id, ime=ime, priimek = priimek, mail = mail)
+
+
+class Prostor:
+    """
+    Razred za prostor.
+    """
+    sql_prostor = "SELECT * FROM prostor WHERE oddelek = ? AND kapaciteta > zasedenost"
+    pogoji = {
+        "oddelek": ("oddelek = ?", str),
+    }
+
+    def __init__(self, id, oddelek, kapaciteta, zasedenost):
+        """
+        Konstruktor osebe.
+        """
+        self.id = id
+        self.oddelek = oddelek
+        self.kapaciteta = kapaciteta
+        self.zasedenost = zasedenost
+
+    def __str__(self):
+        """
+        Znakovna predstavitev osebe.
+        Vrne ime osebe.
+        """
+        return self.id
+    @staticmethod
+    def aliJeProstor(vrsta):
+        """
+        Ali je prostor za vrsto živali vrsta.
+        """
+        for id, oddelek, kapaciteta, zasedenost in conn.execute(Prostor.sql_prostor, [vrsta]):
+            yield Prostor(id=id, oddelek = oddelek, kapaciteta = kapaciteta, zasedenost = zasedenost)
+    @staticmethod
+    @predpomnilnik_prostorov.razveljavi_po
+    def uskladi():
+        """
+        Zasedenost vseh prostorov izračuna iz namestitev.
+        Vrne število popravljenih prostorov.
+        """
+        with conn:
+            stevilo = baza.uskladi_zasedenost(conn)
+        razporejevalnik.nalozen = False
+        return stevilo
+    @staticmethod
+    def vsi(after_id=None, before_id=None, limit=None, **filtri):
+        """
+        Vrne stran prostorov, ki ustrezajo filtrom iz slovarja Prostor.pogoji,
+        urejenih po id.
+        Vrstice se berejo skozi predpomnilnik prostorov.
+        """
+        sql, parametri = filtriraj("SELECT * FROM prostor", Prostor.pogoji, filtri)
+        return listaj(sql, parametri, lambda id, oddelek, kapaciteta, zasedenost:
+                      Prostor(id=id, oddelek = oddelek, kapaciteta = kapaciteta, zasedenost = zasedenost),
+                      "id", after_id, before_id, limit, vrstni_red="id",
+                      predpomnilnik=predpomnilnik_prostorov)
+   
+    
+class Namestitev:
+    """
+    Razred za nam.
+    """
+    def __init__(self, id_z, id_p, id=None):
+        """
+        Konstruktor.
+        """
+        self.id = id
+        self.id_z = id_z
+        self.id_p = id_p
+    @staticmethod
+    def vsi(after_id=None, before_id=None, limit=None):
+        """
+        Vrne stran namestitev, urejenih po rowid.
+        Vrstice se berejo skozi predpomnilnik prostorov.
+        """
+        sql = "SELECT rowid, id_z, id_p FROM namestitev"
+        return listaj(sql, [], lambda id, id_z, id_p:
+                      Namestitev(id_z=id_z, id_p = id_p, id=id),
+                      "rowid", after_id, before_id, limit, vrstni_red="rowid",
+                      predpomnilnik=predpomnilnik_prostorov)
+        
+#cepljenja
+class Cepljenja:
+    """
+    Razred za cep.
+    """
+
+    insert = cepljenja.dodajanje(["id_z", "id_c"])
+    pogoji = {
+        "id_z": ("id_z = ?", int),
+        "id_c": ("id_c = ?", int),
+    }
+    sql_pokritost = """
+        SELECT cepiva.id, cepiva.naziv, namescenost.vrsta,
+               COALESCE(precepljenost.stevilo, 0), namescenost.stevilo
+        FROM cepiva CROSS JOIN namescenost
+        LEFT JOIN precepljenost
+        ON precepljenost.id_c = cepiva.id AND precepljenost.vrsta = namescenost.vrsta
+        ORDER BY cepiva.id, namescenost.vrsta
+    """
+    sql_necepljene = """
+        SELECT id, ime, vrsta, spol, dat_roj, dat_spr, bolezni FROM zival
+        WHERE EXISTS (SELECT 1 FROM namestitev WHERE id_z = zival.id)
+        AND NOT EXISTS (SELECT 1 FROM cepljenja WHERE id_z = zival.id AND id_c = ?)
+    """
+
+    def __init__(self, id_z, id_c, id=None):
+        """
+        Konstruktor cep.
+        """
+        self.id = id
+        self.id_z = id_z
+        self.id_c = id_c
+
+    def __str__(self):
+        """
+        Znakovna predstavitev cep.
+        """
+        return self.id_z + "-" + self.id_c
+
+    def dodaj_v_bazo(self):
+        """
+        Doda cep v bazo.
+        """
+        assert self.id is None
+        with conn:
+            self.id = cepljenja.dodaj_vrstico([self.id_z, self.id_c], self.insert)
+
+    @staticmethod
+    def vsa(after_id=None, before_id=None, limit=None, **filtri):
+        """
+        Vrne stran cepljenj, ki ustrezajo filtrom iz slovarja Cepljenja.pogoji,
+        urejenih po id.
+        """
+        sql, parametri = filtriraj("SELECT * FROM cepljenja", Cepljenja.pogoji, filtri)
+        return listaj(sql, parametri, lambda id, id_z, id_c:
+                      Cepljenja(id=id, id_z = id_z, id_c = id_c),
+                      "id", after_id, before_id, limit, vrstni_red="id")
+
+    @staticmethod
+    def pokritost():
+        """
+        Vrne precepljenost nameščenih živali za vsako cepivo in vrsto.
+        Števila berejo iz povzetkov, ki jih vzdržujejo sprožilci,
+        zato poizvedba ni odvisna od števila cepljenj.
+        """
+        return [Pokritost(id_c, naziv, vrsta, cepljenih, vseh)
+                for id_c, naziv, vrsta, cepljenih, vseh
+                in conn.execute(Cepljenja.sql_pokritost)]
+
+    @staticmethod
+    def necepljene(id_c, after_id=None, before_id=None, limit=None):
+        """
+        Vrne stran nameščenih živali, ki niso cepljene s cepivom id_c,
+        urejenih po id.
+        """
+        return listaj(Cepljenja.sql_necepljene, [id_c],
+                      lambda id, ime, vrsta, spol, dat_roj, dat_spr, bolezni:
+                      Zival(id = id, ime=ime, vrsta=vrsta, spol=spol, dat_roj = dat_roj, dat_spr= dat_spr, bolezni=bolezni),
+                      "id", after_id, before_id, limit, vrstni_red="id")
+
+
+class Pokritost:
+    """
+    Razred za precepljenost vrste s cepivom.
+    """
+
+    def __init__(self, id_c, naziv, vrsta, cepljenih, vseh):
+        """
+        Konstruktor precepljenosti.
+        """
+        self.id_c = id_c
+        self.naziv = naziv
+        self.vrsta = vrsta
+        self.cepljenih = cepljenih
+        self.vseh = vseh
+
+    @property
+    def odstotek(self):
+        """
+        Delež cepljenih živali v odstotkih.
+        """
+        return 100 * self.cepljenih / self.vseh if self.vseh else 0.0
+    
+    #posvojitev
+class Posvojitev:
+    """
+    Razred za pos.
+    """
+    insert = posvojitev.dodajanje(["id_z", "id_o", "datum"])
+    sql_vse = "SELECT id, id_z, id_o, datum FROM posvojitev"
+    pogoji = {
+        "id_z": ("id_z = ?", int),
+        "id_o": ("id_o = ?", int),
+        "od": ("datum >= ?", normaliziraj_datum),
+        "do": ("datum < ?", normaliziraj_datum),
+    }
+    sql_preveri = """
+        SELECT
+            EXISTS (SELECT 1 FROM zival WHERE id = json_extract(value, '$[0]')),
+            EXISTS (SELECT 1 FROM oseba WHERE id = json_extract(value, '$[1]')),
+            EXISTS (SELECT 1 FROM posvojitev WHERE id_z = json_extract(value, '$[0]'))
+        FROM json_each(?)
+    """
+    sql_odstrani_nah = """
+        DELETE FROM namestitev WHERE id_z IN (SELECT value FROM json_each(?))
+        RETURNING id_p
+    """
+
+    def __init__(self, id_z, id_o, datum, id=None):
+        """
+        Konstruktor pos.
+        """
+        self.id = id
+        self.id_z = id_z
+        self.id_o = id_o
+        self.datum = datum
+
+    def __str__(self):
+        """
+        Znakovna predstavitev pos.
+        """
+        return self.id_z + "-" + self.id_o
+
+    def dodaj_v_bazo(self):
+        """
+        Doda cep v bazo.
+        """
+        assert self.id is None
+        with conn:
+            self.id = posvojitev.dodaj_vrstico([self.id_z, self.id_o, normaliziraj_datum(self.datum)], self.insert)
+
+    @staticmethod
+    def vse(after_id=None, before_id=None, limit=None, **filtri):
+        """
+        Vrne stran posvojitev, ki ustrezajo filtrom iz slovarja Posvojitev.pogoji,
+        urejenih po id.
+        """
+        sql, parametri = filtriraj(Posvojitev.sql_vse, Posvojitev.pogoji, filtri)
+        return listaj(sql, parametri, lambda id, id_z, id_o, datum:
+                      Posvojitev(id_z=id_z, id_o=id_o, datum=datum, id=id),
+                      "id", after_id, before_id, limit, vrstni_red="id")
+
+    @staticmethod
+    @predpomnilnik_prostorov.razveljavi_po
+    @baza.ponovi_ob_zaklepu()
+    def posvoji_paket(posvojitve):
+        """
+        Izvede več posvojitev hkrati.
+
+        V eni transakciji z eno poizvedbo preveri vse živali in osebe,
+        nato z executemany vstavi veljavne posvojitve in z eno poizvedbo
+        živali odstrani iz prostorov.
+        Zasedenost prostorov zmanjšajo sprožilci na tabeli namestitev.
+        Vrne seznam napak v enakem vrstnem redu kot posvojitve;
+        za uspešne posvojitve je na seznamu None.
+        """
+        assert all(p.id is None for p in posvojitve)
+        napake = []
+        with baza.transakcija(conn):
+            preverjene = conn.execute(Posvojitev.sql_preveri, [
+                json.dumps([[p.id_z, p.id_o] for p in posvojitve])]).fetchall()
+            posvojene = set()
+            for p, (zival_obstaja, oseba_obstaja, je_posvojena) in zip(posvojitve, preverjene):
+                if not zival_obstaja:
+                    napake.append('Žival s tem ID ne obstaja.')
+                elif not oseba_obstaja:
+                    napake.append('Oseba s tem ID ne obstaja.')
+                elif je_posvojena or p.id_z in posvojene:
+                    napake.append('Žival je že posvojena.')
+                else:
+                    napake.append(None)
+                    posvojene.add(p.id_z)
+            veljavne = [p for p, napaka in zip(posvojitve, napake) if napaka is None]
+            conn.executemany(Posvojitev.insert, (
+                [p.id_z, p.id_o, normaliziraj_datum(p.datum)] for p in veljavne))
+            prostori = [id_p for id_p, in conn.execute(
+                Posvojitev.sql_odstrani_nah, [json.dumps(sorted(posvojene))])]
+        for id_p in prostori:
+            razporejevalnik.sprosti(id_p)
+        return napake
+
+
+# Iskanje kratkih nizov (sql_poisci_kratko) namenoma pregleda tabelo,
+# saj podniza ne najde noben indeks, zato ga ni med vročimi poizvedbami.
+VROCE_POIZVEDBE = [
+    (Zival.sql_poisci, ['"ime"']),
+    (Oseba.sql_poisci, ['"ime"']),
+    (Zival.sql_najmlajsi, ["P"]),
+    (Zival.sql_rojene, ["2020-01-01", "2020-02-01"]),
+    (Zival.sql_sprejete, ["2020-01-01", "2020-02-01"]),
+    (Zival.sql_posvojena, [1]),
+    (Zival.sql_odstrani_nah, [1]),
+    (Zival.sql_nahajalisce, [1]),
+    (Prostor.sql_prostor, ["P"]),
+    (Posvojitev.sql_preveri, ["[[1, 1]]"]),
+    (Posvojitev.sql_odstrani_nah, ["[1]"]),
+    (Posvojitev.sql_vse + " WHERE datum >= ? AND datum < ?", ["2020-01-01", "2020-02-01"]),
+]
+
+
+def preveri_indekse():
+    """
+    Vrne vroče poizvedbe, ki ne uporabljajo indeksov, skupaj z njihovimi načrti.
+    """
+    return baza.preveri_nacrte(conn, VROCE_POIZVEDBE)
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description='Orodja za model zavetišča.')
+    parser.add_argument('--preveri-indekse', action='store_true',
+                        help='izpiši vroče poizvedbe, ki ne uporabljajo indeksov')
+    argumenti = parser.parse_args()
+    pripravi_bazo()
+    if argumenti.preveri_indekse:
+        slabe = preveri_indekse()
+        for sql, nacrt in slabe.items():
+            print(" ".join(sql.split()))
+            for korak in nacrt:
+                print("    " + korak)
+        print("Vročih poizvedb brez indeksa: {} od {}".format(
+            len(slabe), len(VROCE_POIZVEDBE)))
+        sys.exit(1 if slabe else 0)
+    parser.print_help()
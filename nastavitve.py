@@ -0,0 +1,34 @@
+import json
+import random
+import sys
+
+NASTAVITVE = 'NASTAVITVE.json'
+
+
+def preberi_nastavitve():
+    """
+    Prebere nastavitve iz datoteke NASTAVITVE.
+    Če datoteka ne obstaja, jo ustvari z naključno skrivnostjo.
+    """
+    try:
+        with open(NASTAVITVE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        skrivnost = "".join(chr(random.randrange(32, 128)) for _ in range(32))
+        with open(NASTAVITVE, "w") as f:
+            json.dump({'skrivnost': skrivnost}, f)
+        return {'skrivnost': skrivnost}
+
+
+def preveri_nastavitve(nastavitve):
+    """
+    Opozori, če v nastavitvah ni profila za SQLite,
+    ker se potem vse nastavitve zmogljivosti tiho nadomestijo s privzetimi.
+    """
+    if 'sqlite' not in nastavitve:
+        print("Opozorilo: v datoteki {} ni razdelka 'sqlite', "
+              "uporabljajo se privzete nastavitve.".format(NASTAVITVE), file=sys.stderr)
+
+
+nastavitve = preberi_nastavitve()
+preveri_nastavitve(nastavitve)
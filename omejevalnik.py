@@ -0,0 +1,85 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class Omejevalnik:
+    """
+    Omejevalnik pogostosti zahtev z vedri žetonov.
+
+    Vsak ključ (npr. naslov odjemalca ali uporabniško ime) ima svoje vedro
+    z največ kapaciteta žetoni, ki se polni s hitrostjo hitrost žetonov
+    na sekundo. Vsaka zahteva porabi po en žeton iz vedra vsakega ključa.
+
+    Hrani največ najvec veder; ko jih je več, pozabi najdlje neuporabljena.
+    Pozabljeno vedro je ob naslednji zahtevi spet polno.
+    """
+
+    def __init__(self, hitrost=0.2, kapaciteta=10, najvec=10000):
+        """
+        Konstruktor omejevalnika.
+
+        Argumenti:
+        - hitrost: število žetonov, ki se vedru dodajo v sekundi
+        - kapaciteta: največje število žetonov v vedru
+        - najvec: največje število hranjenih veder
+        """
+        self.hitrost = hitrost
+        self.kapaciteta = kapaciteta
+        self.najvec = najvec
+        self.ponastavi()
+        os.register_at_fork(after_in_child=self.ponastavi)
+
+    def ponastavi(self):
+        """
+        Pozabi vsa vedra.
+        """
+        self.lock = threading.Lock()
+        self.vedra = OrderedDict()
+        self.zavrnjene = 0
+
+    def zetoni(self, kljuc, zdaj):
+        """
+        Vrne število žetonov v vedru ključa ob času zdaj.
+        Kliče se z zaklenjeno ključavnico.
+        """
+        if kljuc not in self.vedra:
+            return self.kapaciteta
+        zetoni, cas = self.vedra[kljuc]
+        return min(self.kapaciteta, zetoni + (zdaj - cas) * self.hitrost)
+
+    def porabi(self, kljuci):
+        """
+        Iz vedra vsakega ključa porabi po en žeton,
+        če je v vseh vedrih vsaj en žeton.
+        Vrne 0, če je zahteva dovoljena, sicer pa število sekund,
+        po katerem bo zahteva spet dovoljena.
+        """
+        with self.lock:
+            zdaj = time.monotonic()
+            stanje = {kljuc: self.zetoni(kljuc, zdaj) for kljuc in kljuci}
+            manjka = max(1 - zetoni for zetoni in stanje.values())
+            if manjka > 0:
+                self.zavrnjene += 1
+                return math.ceil(manjka / self.hitrost)
+            for kljuc, zetoni in stanje.items():
+                self.vedra[kljuc] = (zetoni - 1, zdaj)
+                self.vedra.move_to_end(kljuc)
+            while len(self.vedra) > self.najvec:
+                self.vedra.popitem(last=False)
+            return 0
+
+    def statistika(self):
+        """
+        Vrne slovar s števcem zavrnjenih zahtev in številom hranjenih veder.
+        """
+        with self.lock:
+            return {
+                "zavrnjene": self.zavrnjene,
+                "vedra": len(self.vedra),
+                "najvec": self.najvec,
+                "hitrost": self.hitrost,
+                "kapaciteta": self.kapaciteta,
+            }
@@ -1,50 +1,98 @@
-from enum import Enum
-from functools import wraps
-
-class Meni(Enum):
-    """
-    Razred za izbire v menijih.
-    """
-    def __init__(self, ime, funkcija):
-        """
-        Konstruktor izbire.
-        """
-        self.ime = ime
-        self.funkcija = funkcija
-
-    def __str__(self):
-        """
-        Znakovna predstavitev izbire.
-        """
-        return self.ime
-
-
-class Seznam(Enum):
-    """
-    Razred za sezname.
-    """
-    def __str__(self):
-        """
-        Znakovna predstavitev vnosa.
-        """
-        return self.value
-
-
-class JaNe(Seznam):
-    """
-    Razred za izbiro ja/ne.
-    """
-    JA = "Ja"
-    NE = "Ne"
-
-def prekinitev(fun):
-    """
-    Dekorator za obravnavo prekinitev s Ctrl+C.
-    """
-    @wraps(fun)
-    def funkcija(*largs, **kwargs):
-        try:
-            fun(*largs, **kwargs)
-        except KeyboardInterrupt:
-            print("\nPrekinitev!")
-    return funkcija
\ No newline at end of file
+import datetime
+import re
+import unicodedata
+from enum import Enum
+from functools import wraps
+
+class Meni(Enum):
+    """
+    Razred za izbire v menijih.
+    """
+    def __init__(self, ime, funkcija):
+        """
+        Konstruktor izbire.
+        """
+        self.ime = ime
+        self.funkcija = funkcija
+
+    def __str__(self):
+        """
+        Znakovna predstavitev izbire.
+        """
+        return self.ime
+
+
+class Seznam(Enum):
+    """
+    Razred za sezname.
+    """
+    def __str__(self):
+        """
+        Znakovna predstavitev vnosa.
+        """
+        return self.value
+
+
+class JaNe(Seznam):
+    """
+    Razred za izbiro ja/ne.
+    """
+    JA = "Ja"
+    NE = "Ne"
+
+def prekinitev(fun):
+    """
+    Dekorator za obravnavo prekinitev s Ctrl+C.
+    """
+    @wraps(fun)
+    def funkcija(*largs, **kwargs):
+        try:
+            fun(*largs, **kwargs)
+        except KeyboardInterrupt:
+            print("\nPrekinitev!")
+    return funkcija
+
+
+def normaliziraj(niz):
+    """
+    Vrne iskalni ključ niza.
+
+    Ključ je zapisan z malimi črkami in brez strešic ter drugih naglasov,
+    tako da se npr. "Šuštar" in "sustar" ujemata.
+    """
+    if niz is None:
+        return None
+    razstavljen = unicodedata.normalize("NFKD", niz.replace("đ", "d").replace("Đ", "D"))
+    return "".join(znak for znak in razstavljen
+                   if not unicodedata.combining(znak)).casefold()
+
+
+OBLIKE_DATUMA = [
+    (re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})"), (0, 1, 2)),
+    (re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})"), (2, 0, 1)),
+    (re.compile(r"(\d{1,2})\. ?(\d{1,2})\. ?(\d{4})"), (2, 1, 0)),
+]
+
+
+def normaliziraj_datum(niz):
+    """
+    Vrne datum v obliki ISO 8601 (LLLL-MM-DD).
+
+    Sprejme datum v obliki LLLL-MM-DD, M/D/LLLL (kot v podatkih CSV)
+    ali D. M. LLLL. Prazen niz in None pretvori v None,
+    ob neveljavnem datumu pa sproži ValueError.
+    """
+    if niz is None:
+        return None
+    niz = niz.strip()
+    if not niz:
+        return None
+    for oblika, (leto, mesec, dan) in OBLIKE_DATUMA:
+        ujemanje = oblika.fullmatch(niz)
+        if ujemanje:
+            deli = [int(stevilo) for stevilo in ujemanje.groups()]
+            try:
+                return datetime.date(deli[leto], deli[mesec], deli[dan]).isoformat()
+            except ValueError:
+                break
+    raise ValueError("Neveljaven datum: {}".format(niz))
@@ -0,0 +1,263 @@
+import ast
+import functools
+import glob
+import hashlib
+import marshal
+import os
+import sys
+import bottle
+
+MAPA = os.path.join('views', '__pycache__')
+VELIKOST_KOSA = 16 * 1024
+OZNAKA = '\x00vsebina\x00'
+
+
+class PrevedenaPredloga(bottle.SimpleTemplate):
+    """
+    Predloga, ki prevedeno kodo hrani v mapi MAPA.
+
+    Ime datoteke vsebuje zgostitev izvorne kode predloge in oznako
+    različice Pythona, zato se ob spremembi predloge ali Pythona
+    predloga prevede na novo.
+    """
+
+    def datoteka_kode(self, vrsta='marshal'):
+        """
+        Vrne pot do datoteke s prevedeno kodo predloge.
+        """
+        izvor = self.source
+        if not izvor:
+            with open(self.filename, 'rb') as f:
+                izvor = f.read()
+        if isinstance(izvor, str):
+            izvor = izvor.encode('utf-8')
+        zgostitev = hashlib.sha256(izvor)
+        zgostitev.update(str(self.syntax).encode('utf-8'))
+        zgostitev.update(bottle.__version__.encode('utf-8'))
+        ime = os.path.basename(self.filename or self.name or 'predloga')
+        return os.path.join(MAPA, '{}.{}.{}.{}'.format(
+            ime, zgostitev.hexdigest()[:16], sys.implementation.cache_tag, vrsta))
+
+    def nalozi_kodo(self, vrsta, prevedi):
+        """
+        Prebere prevedeno kodo iz datoteke.
+        Če datoteke ni, kodo prevede s funkcijo prevedi in jo shrani.
+        """
+        datoteka = self.datoteka_kode(vrsta)
+        try:
+            with open(datoteka, 'rb') as f:
+                return marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+        koda = prevedi()
+        try:
+            os.makedirs(MAPA, exist_ok=True)
+            zacasna = '{}.{}'.format(datoteka, os.getpid())
+            with open(zacasna, 'wb') as f:
+                marshal.dump(koda, f)
+            os.replace(zacasna, datoteka)
+        except OSError:
+            pass
+        return koda
+
+    @bottle.cached_property
+    def co(self):
+        """
+        Prevedena koda predloge.
+        """
+        return self.nalozi_kodo('marshal', lambda: compile(
+            self.code, self.filename or '<string>', 'exec'))
+
+
+class Pretok(ast.NodeTransformer):
+    """
+    Preoblikovalec kode predloge, ki klice _printlist zamenja z yield.
+    """
+
+    def visit_Expr(self, vozlisce):
+        """
+        Zamenja klic _printlist((...)) z yield (...).
+        """
+        klic = vozlisce.value
+        if isinstance(klic, ast.Call) and isinstance(klic.func, ast.Name) \
+                and klic.func.id == '_printlist':
+            return ast.copy_location(ast.Expr(ast.Yield(klic.args[0])), vozlisce)
+        return vozlisce
+
+
+def prirejena_imena(stavki):
+    """
+    Vrne imena, ki jim stavki kaj priredijo,
+    brez imen znotraj definicij funkcij in razredov.
+    """
+    imena = set()
+    sklad = list(stavki)
+    while sklad:
+        vozlisce = sklad.pop()
+        if isinstance(vozlisce, (ast.FunctionDef, ast.ClassDef, ast.Lambda)):
+            imena.add(getattr(vozlisce, 'name', None))
+            continue
+        if isinstance(vozlisce, ast.Name) and isinstance(vozlisce.ctx, ast.Store):
+            imena.add(vozlisce.id)
+        sklad.extend(ast.iter_child_nodes(vozlisce))
+    imena.discard(None)
+    return sorted(imena)
+
+
+class PretocnaPredloga(PrevedenaPredloga):
+    """
+    Predloga, ki jo lahko izrisujemo po kosih.
+
+    Koda predloge se prevede v generator, ki namesto zapisovanja
+    v izhod vrača kose besedila.
+    Tako se prvi del strani pošlje, še preden se preberejo vsi podatki,
+    poraba pomnilnika pa je omejena z velikostjo kosa.
+    """
+
+    def prevedi_pretok(self):
+        """
+        Prevede kodo predloge v generatorsko funkcijo _pretok.
+        Imena, ki jim koda kaj priredi, ostanejo globalna kot v navadni predlogi.
+        """
+        telo = Pretok().visit(ast.parse(self.code)).body
+        imena = prirejena_imena(telo)
+        if imena:
+            telo.insert(0, ast.Global(names=imena))
+        telo.append(ast.Expr(ast.Yield(ast.Tuple(elts=[], ctx=ast.Load()))))
+        funkcija = ast.FunctionDef(
+            name='_pretok', body=telo, decorator_list=[], returns=None,
+            args=ast.arguments(posonlyargs=[], args=[], vararg=None,
+                               kwonlyargs=[], kw_defaults=[], kwarg=None,
+                               defaults=[]))
+        modul = ast.fix_missing_locations(ast.Module(body=[funkcija], type_ignores=[]))
+        return compile(modul, self.filename or '<string>', 'exec')
+
+    @bottle.cached_property
+    def co_pretok(self):
+        """
+        Prevedena koda predloge v obliki generatorja.
+        """
+        return self.nalozi_kodo('pretok.marshal', self.prevedi_pretok)
+
+    def okvir(self, okolje, ime, argumenti):
+        """
+        Izriše osnovo, ki jo predloga vključi z rebase,
+        in jo vrne razdeljeno na del pred vsebino in del za njo.
+        Če osnova vsebine ne vključi, vrne None.
+        """
+        if ime not in self.cache:
+            self.cache[ime] = self.__class__(name=ime, lookup=self.lookup, syntax=self.syntax)
+        okolje = okolje.copy()
+        okolje.update(argumenti)
+        okolje['base'] = OZNAKA
+        izhod = []
+        self.cache[ime].execute(izhod, okolje)
+        deli = ''.join(izhod).split(OZNAKA)
+        return deli if len(deli) == 2 else None
+
+    def izrisuj(self, *args, velikost=None, **kwargs):
+        """
+        Izrisuje predlogo in vrača kose besedila.
+
+        Prvi kos se vrne takoj, ko je znan začetek osnove in vsebine,
+        nadaljnji pa, ko se nabere vsaj velikost znakov.
+        Dokler predloga ne pokliče rebase, se izhod zadržuje.
+        """
+        velikost = velikost or VELIKOST_KOSA
+        stdout = []
+        okolje = {}
+        for dictarg in args:
+            okolje.update(dictarg)
+        okolje.update(kwargs)
+        okolje = self.execute(stdout, okolje, koda=self.co_pretok)
+        kosi = okolje['_pretok']()
+        zadrzano, rep, poslano = [], None, False
+        for kos in kosi:
+            zadrzano.extend(stdout)
+            del stdout[:]
+            zadrzano.extend(kos)
+            if rep is None and okolje.get('_rebase'):
+                ime, argumenti = okolje.pop('_rebase')
+                deli = self.okvir(okolje, ime, argumenti)
+                if deli is None:
+                    okolje['_rebase'] = (ime, argumenti)
+                    rep = False
+                else:
+                    glava, rep = deli
+                    zadrzano.insert(0, glava)
+            if rep is None or rep is False:
+                continue
+            if not poslano or sum(map(len, zadrzano)) >= velikost:
+                yield ''.join(zadrzano)
+                del zadrzano[:]
+                poslano = True
+        zadrzano.extend(stdout)
+        if rep:
+            zadrzano.append(rep)
+        elif okolje.get('_rebase'):
+            ime, argumenti = okolje.pop('_rebase')
+            argumenti['base'] = ''.join(zadrzano)
+            zadrzano = []
+            self._include(dict(okolje, _stdout=zadrzano), ime, **argumenti)
+        if zadrzano:
+            yield ''.join(zadrzano)
+
+    def execute(self, _stdout, kwargs, koda=None):
+        """
+        Izvede kodo predloge.
+        Če je podana koda, jo le izvede in vrne okolje brez obravnave rebase.
+        """
+        if koda is None:
+            return super().execute(_stdout, kwargs)
+        okolje = self.defaults.copy()
+        okolje.update(kwargs)
+        okolje.update({
+            '_stdout': _stdout,
+            '_printlist': _stdout.extend,
+            'include': functools.partial(self._include, okolje),
+            'rebase': functools.partial(self._rebase, okolje),
+            '_rebase': None,
+            '_str': self._str,
+            '_escape': self._escape,
+            'get': okolje.get,
+            'setdefault': okolje.setdefault,
+            'defined': okolje.__contains__
+        })
+        exec(koda, okolje)
+        return okolje
+
+
+def prevedi_predloge():
+    """
+    Prevede vse predloge iz mape views in jih shrani v predpomnilnik bottla.
+    Predloge si delijo prevedene osnove, ki jih vključijo z rebase.
+
+    Vrne število prevedenih predlog.
+    """
+    predloge = {}
+    for pot in glob.glob(os.path.join('views', '*.html')):
+        ime = os.path.basename(pot)
+        predloge[ime] = PretocnaPredloga(name=ime, lookup=bottle.TEMPLATE_PATH)
+        predloge[ime].co
+        predloge[ime].co_pretok
+    for ime, predloga in predloge.items():
+        predloga.cache.update(predloge)
+        bottle.TEMPLATES[(id(bottle.TEMPLATE_PATH), ime)] = predloga
+    return len(predloge)
+
+
+def pretok(_ime, **kwargs):
+    """
+    Vrne generator, ki predlogo s podanim imenom izrisuje po kosih.
+    Poimenovani argumenti so spremenljivke predloge.
+    """
+    kljuc = (id(bottle.TEMPLATE_PATH), _ime)
+    predloga = bottle.TEMPLATES.get(kljuc)
+    if not isinstance(predloga, PretocnaPredloga) or bottle.DEBUG:
+        predloga = PretocnaPredloga(name=_ime, lookup=bottle.TEMPLATE_PATH)
+        bottle.TEMPLATES[kljuc] = predloga
+    return predloga.izrisuj(kwargs)
+
+
+if __name__ == '__main__':
+    print("Prevedenih predlog:", prevedi_predloge())
@@ -0,0 +1,238 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+
+def velikost_vrstic(vrstice):
+    """
+    Oceni, koliko bajtov pomnilnika zasedajo vrstice poizvedbe.
+    """
+    return sys.getsizeof(vrstice) + sum(
+        sys.getsizeof(vrstica) + sum(sys.getsizeof(polje) for polje in vrstica)
+        for vrstica in vrstice)
+
+
+class Predpomnilnik:
+    """
+    Predpomnilnik rezultatov poizvedb, ki se berejo pogosteje,
+    kot se podatki spreminjajo.
+
+    Rezultate razveljavijo poti za pisanje (metoda razveljavi
+    ali dekorator razveljavi_po). Če je podan bazen, spremembe iz drugih
+    procesov zazna s PRAGMA data_version na lastni povezavi, ki se
+    spremeni ob vsaki potrditvi transakcije na kateri drugi povezavi.
+
+    Polja razreda:
+    - NAJVEC: največje število shranjenih rezultatov
+    """
+    NAJVEC = 256
+
+    def __init__(self, bazen=None):
+        """
+        Konstruktor predpomnilnika.
+
+        Argumenti:
+        - bazen: bazen povezav, iz katerega se odpre povezava
+          za preverjanje različice podatkov, ali None
+        """
+        self.bazen = bazen
+        self.ponastavi()
+        os.register_at_fork(after_in_child=self.ponastavi)
+
+    def ponastavi(self):
+        """
+        Pozabi vse rezultate in povezavo za preverjanje različice.
+        """
+        self.lock = threading.Lock()
+        self.vrednosti = {}
+        self.generacija = 0
+        self.verzija = None
+        self.conn = None
+
+    def izprazni(self):
+        """
+        Pozabi vse rezultate.
+        Kliče se z zaklenjeno ključavnico.
+        """
+        self.vrednosti.clear()
+        self.generacija += 1
+
+    def preveri(self):
+        """
+        Če so podatke spremenile druge povezave, pozabi vse rezultate.
+        Kliče se z zaklenjeno ključavnico.
+        """
+        if self.bazen is None:
+            return
+        if self.conn is None:
+            self.conn = self.bazen.odpri()
+        verzija = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if verzija != self.verzija:
+            self.verzija = verzija
+            self.izprazni()
+
+    def poisci(self, kljuc):
+        """
+        Vrne par (ali je rezultat shranjen, rezultat).
+        Kliče se z zaklenjeno ključavnico.
+        """
+        if kljuc in self.vrednosti:
+            return True, self.vrednosti[kljuc]
+        return False, None
+
+    def shrani(self, kljuc, vrednost):
+        """
+        Shrani rezultat; če je rezultatov preveč, pozabi najstarejšega.
+        Kliče se z zaklenjeno ključavnico.
+        """
+        if len(self.vrednosti) >= self.NAJVEC:
+            del self.vrednosti[next(iter(self.vrednosti))]
+        self.vrednosti[kljuc] = vrednost
+
+    def razveljavi(self):
+        """
+        Pozabi vse rezultate.
+        """
+        with self.lock:
+            self.izprazni()
+
+    def razveljavi_po(self, fun):
+        """
+        Dekorator, ki po klicu funkcije, ki piše v bazo, pozabi vse rezultate.
+        """
+        @wraps(fun)
+        def funkcija(*largs, **kwargs):
+            try:
+                return fun(*largs, **kwargs)
+            finally:
+                self.razveljavi()
+        return funkcija
+
+    def preberi(self, kljuc, izracunaj):
+        """
+        Vrne shranjen rezultat za ključ.
+        Če ga ni, ga izračuna s funkcijo izracunaj brez argumentov
+        in shrani, če ga med računanjem ni razveljavilo pisanje.
+        """
+        with self.lock:
+            self.preveri()
+            najden, vrednost = self.poisci(kljuc)
+            if najden:
+                return vrednost
+            generacija = self.generacija
+        vrednost = izracunaj()
+        with self.lock:
+            if generacija == self.generacija:
+                self.shrani(kljuc, vrednost)
+        return vrednost
+
+
+class LRUPredpomnilnik(Predpomnilnik):
+    """
+    Omejen predpomnilnik, ki rezultate hrani največ dani čas
+    in ob prekoračitvi števila ali velikosti rezultatov pozabi
+    najdlje neuporabljene.
+
+    Šteje zadetke, zgrešitve, izločitve in potekle rezultate.
+    """
+
+    def __init__(self, najvec=1024, trajanje=60, pomnilnik=16 * 1024 * 1024, bazen=None):
+        """
+        Konstruktor predpomnilnika.
+
+        Argumenti:
+        - najvec: največje število shranjenih rezultatov
+        - trajanje: čas v sekundah, po katerem rezultat poteče
+        - pomnilnik: največja skupna ocenjena velikost rezultatov v bajtih
+        - bazen: kot pri razredu Predpomnilnik
+        """
+        self.najvec = najvec
+        self.trajanje = trajanje
+        self.pomnilnik = pomnilnik
+        super().__init__(bazen)
+
+    def ponastavi(self):
+        """
+        Pozabi vse rezultate in ponastavi števce.
+        """
+        super().ponastavi()
+        self.vrednosti = OrderedDict()
+        self.velikost = 0
+        self.zadetki = 0
+        self.zgresitve = 0
+        self.izlocitve = 0
+        self.potekli = 0
+        self.razveljavitve = 0
+
+    def izprazni(self):
+        """
+        Pozabi vse rezultate.
+        Kliče se z zaklenjeno ključavnico.
+        """
+        super().izprazni()
+        self.velikost = 0
+        self.razveljavitve += 1
+
+    def odstrani(self, kljuc):
+        """
+        Pozabi rezultat za ključ.
+        Kliče se z zaklenjeno ključavnico.
+        """
+        vrednost, rok, velikost = self.vrednosti.pop(kljuc)
+        self.velikost -= velikost
+
+    def poisci(self, kljuc):
+        """
+        Vrne par (ali je rezultat shranjen, rezultat).
+        Potekel rezultat pozabi, najdenega označi kot nazadnje uporabljenega.
+        Kliče se z zaklenjeno ključavnico.
+        """
+        if kljuc in self.vrednosti:
+            vrednost, rok, velikost = self.vrednosti[kljuc]
+            if rok > time.monotonic():
+                self.vrednosti.move_to_end(kljuc)
+                self.zadetki += 1
+                return True, vrednost
+            self.odstrani(kljuc)
+            self.potekli += 1
+        self.zgresitve += 1
+        return False, None
+
+    def shrani(self, kljuc, vrednost):
+        """
+        Shrani rezultat in pozabi najdlje neuporabljene rezultate,
+        dokler niso meje spet upoštevane.
+        Rezultata, ki je sam večji od meje pomnilnika, ne shrani.
+        Kliče se z zaklenjeno ključavnico.
+        """
+        velikost = velikost_vrstic(vrednost)
+        if velikost > self.pomnilnik:
+            return
+        if kljuc in self.vrednosti:
+            self.odstrani(kljuc)
+        self.vrednosti[kljuc] = (vrednost, time.monotonic() + self.trajanje, velikost)
+        self.velikost += velikost
+        while len(self.vrednosti) > self.najvec or self.velikost > self.pomnilnik:
+            self.odstrani(next(iter(self.vrednosti)))
+            self.izlocitve += 1
+
+    def statistika(self):
+        """
+        Vrne slovar s števci in trenutno zasedenostjo predpomnilnika.
+        """
+        with self.lock:
+            return {
+                "zadetki": self.zadetki,
+                "zgresitve": self.zgresitve,
+                "izlocitve": self.izlocitve,
+                "potekli": self.potekli,
+                "razveljavitve": self.razveljavitve,
+                "stevilo": len(self.vrednosti),
+                "najvec": self.najvec,
+                "velikost": self.velikost,
+                "pomnilnik": self.pomnilnik,
+                "trajanje": self.trajanje,
+            }
@@ -0,0 +1,130 @@
+import heapq
+import os
+import threading
+
+POLITIKE = {
+    'prvi': lambda id, prosto: (id, ),
+    'najboljsi': lambda id, prosto: (prosto, id),
+    'najslabsi': lambda id, prosto: (-prosto, id),
+}
+
+
+class Razporejevalnik:
+    """
+    Razporejevalnik živali po prostorih.
+
+    Za vsak oddelek hrani kopico prostorov s prostimi mesti, urejeno
+    po izbrani politiki:
+    - prvi: prostor z najmanjšim id
+    - najboljsi: prostor z najmanj prostimi mesti
+    - najslabsi: prostor z največ prostimi mesti
+
+    Dodeljevanje in sproščanje mesta trajata O(log n).
+    Ob spremembi števila prostih mest se v kopico doda nov vnos,
+    zastareli vnosi pa se zavržejo, ko pridejo na vrh kopice.
+
+    Razporejevalnik je le pomnilniški odsev tabele prostor.
+    O tem, ali je prostor res prost, odloča baza,
+    zato ga je treba ob neskladju z bazo znova naložiti.
+    """
+
+    def __init__(self, politika='prvi'):
+        """
+        Konstruktor razporejevalnika.
+
+        Argumenti:
+        - politika: ključ v slovarju POLITIKE
+        """
+        if politika not in POLITIKE:
+            raise ValueError("Neznana politika razporejanja: {}".format(politika))
+        self.politika = politika
+        self.kljuc = POLITIKE[politika]
+        self.ponastavi()
+        os.register_at_fork(after_in_child=self.ponastavi)
+
+    def ponastavi(self):
+        """
+        Izprazni razporejevalnik.
+        Ob naslednjem dodeljevanju se prostori znova naložijo iz baze.
+        """
+        self.lock = threading.Lock()
+        self.nalozen = False
+        self.prosto = {}
+        self.oddelki = {}
+        self.kopice = {}
+
+    def nalozi(self, conn):
+        """
+        Prosta mesta vseh prostorov prebere iz baze.
+        """
+        vrstice = conn.execute(
+            "SELECT id, oddelek, kapaciteta - zasedenost FROM prostor").fetchall()
+        with self.lock:
+            self.prosto = {}
+            self.oddelki = {}
+            self.kopice = {}
+            for id, oddelek, prosto in vrstice:
+                self.prosto[id] = prosto
+                self.oddelki[id] = oddelek
+                kopica = self.kopice.setdefault(oddelek, [])
+                if prosto > 0:
+                    kopica.append(self.vnos(id, prosto))
+            for kopica in self.kopice.values():
+                heapq.heapify(kopica)
+            self.nalozen = True
+
+    def vnos(self, id, prosto):
+        """
+        Vrne vnos za kopico.
+        """
+        return self.kljuc(id, prosto) + (id, prosto)
+
+    def dodaj(self, id):
+        """
+        V kopico oddelka doda vnos za prostor s trenutnim številom prostih mest.
+        Kopico, v kateri je preveč zastarelih vnosov, zgradi na novo.
+        """
+        kopica = self.kopice.setdefault(self.oddelki[id], [])
+        heapq.heappush(kopica, self.vnos(id, self.prosto[id]))
+        if len(kopica) > 2 * len(self.prosto) + 16:
+            kopica[:] = [v for v in kopica if self.prosto[v[-2]] == v[-1]]
+            heapq.heapify(kopica)
+
+    def dodeli(self, oddelek):
+        """
+        Dodeli eno mesto v prostoru oddelka.
+        Vrne id prostora ali None, če v oddelku ni prostega mesta.
+        """
+        return self.dodeli_paket([oddelek])[0]
+
+    def dodeli_paket(self, oddelki):
+        """
+        V enem prehodu dodeli po eno mesto za vsak oddelek v seznamu.
+        Vrne seznam id-jev prostorov; kjer mesta ni, je na seznamu None.
+        """
+        prostori = []
+        with self.lock:
+            for oddelek in oddelki:
+                kopica = self.kopice.get(oddelek, [])
+                id = None
+                while kopica:
+                    kandidat, prosto = heapq.heappop(kopica)[-2:]
+                    if self.prosto[kandidat] == prosto:
+                        id = kandidat
+                        self.prosto[id] = prosto - 1
+                        if prosto > 1:
+                            self.dodaj(id)
+                        break
+                prostori.append(id)
+        return prostori
+
+    def sprosti(self, id):
+        """
+        Sprosti eno mesto v prostoru z danim id.
+        """
+        with self.lock:
+            if id not in self.prosto:
+                return
+            self.prosto[id] += 1
+            if self.prosto[id] > 0:
+                self.dodaj(id)
@@ -0,0 +1,173 @@
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+class Seja:
+    """
+    Razred za sejo prijavljenega uporabnika.
+    """
+
+    def __init__(self, id, ime, uid, rok):
+        """
+        Konstruktor seje.
+
+        Argumenti:
+        - id: naključni identifikator seje, ki se hrani v piškotku
+        - ime: uporabniško ime
+        - uid: id uporabnika
+        - rok: čas (time.time()), ko seja poteče
+        """
+        self.id = id
+        self.ime = ime
+        self.uid = uid
+        self.rok = rok
+
+
+class Seje:
+    """
+    Shramba sej prijavljenih uporabnikov.
+
+    Seje hrani v pomnilniku, največ najvec sej; ko jih je več,
+    pozabi najdlje neuporabljene. Seja poteče, če je ni nihče uporabil
+    trajanje sekund; vsaka uporaba ji rok podaljša.
+
+    Če je podan bazen, se seje hranijo tudi v tabeli seja,
+    tako da ostanejo veljavne po ponovnem zagonu strežnika
+    in so skupne vsem procesom strežnika. Tabela je tedaj merodajna:
+    seja je veljavna le, če je njena vrstica v bazi, zato odjava
+    v enem procesu velja tudi v ostalih. Rok seje se v bazi podaljša le,
+    ko se je od zadnjega zapisa spremenil za več kot desetino trajanja.
+    """
+    sql_preberi = "SELECT ime, uid, rok FROM seja WHERE id = ? AND rok > ?"
+    sql_dodaj = "INSERT INTO seja (id, ime, uid, rok) VALUES (?, ?, ?, ?)"
+    sql_podaljsaj = "UPDATE seja SET rok = ? WHERE id = ?"
+    sql_odstrani = "DELETE FROM seja WHERE id = ?"
+    sql_pocisti = "DELETE FROM seja WHERE rok <= ?"
+
+    def __init__(self, najvec=10000, trajanje=7 * 24 * 3600, bazen=None):
+        """
+        Konstruktor shrambe sej.
+
+        Argumenti:
+        - najvec: največje število sej v pomnilniku
+        - trajanje: čas v sekundah, po katerem neuporabljena seja poteče
+        - bazen: bazen povezav, iz katerega se prevzemajo povezave
+          za hranjenje sej v bazi, ali None
+        """
+        self.najvec = najvec
+        self.trajanje = trajanje
+        self.bazen = bazen
+        self.ponastavi()
+        os.register_at_fork(after_in_child=self.ponastavi)
+
+    def ponastavi(self):
+        """
+        Pozabi seje v pomnilniku.
+        """
+        self.lock = threading.Lock()
+        self.seje = OrderedDict()
+        self.zapisani = {}
+        self.generacija = 0
+
+    def povezava(self):
+        """
+        Vrne povezavo trenutne niti iz bazena ali None, če se seje ne hranijo v bazi.
+        Med obdelavo zahteve je to povezava, ki je dodeljena zahtevi,
+        zato se niti pri branju baze ne čakajo med seboj.
+        """
+        if self.bazen is None:
+            return None
+        return self.bazen.prevzemi()
+
+    def zapomni(self, seja, zapisan):
+        """
+        Shrani sejo v pomnilnik; če je sej preveč, pozabi najdlje neuporabljeno.
+        Kliče se z zaklenjeno ključavnico.
+        """
+        self.seje[seja.id] = seja
+        self.seje.move_to_end(seja.id)
+        self.zapisani[seja.id] = zapisan
+        while len(self.seje) > self.najvec:
+            id, _ = self.seje.popitem(last=False)
+            del self.zapisani[id]
+
+    def pozabi(self, id):
+        """
+        Pozabi sejo v pomnilniku.
+        Kliče se z zaklenjeno ključavnico.
+        """
+        self.seje.pop(id, None)
+        self.zapisani.pop(id, None)
+
+    def ustvari(self, ime, uid):
+        """
+        Ustvari novo sejo za uporabnika in jo vrne.
+        """
+        zdaj = time.time()
+        seja = Seja(secrets.token_urlsafe(32), ime, uid, zdaj + self.trajanje)
+        conn = self.povezava()
+        if conn is not None:
+            with conn:
+                conn.execute(self.sql_pocisti, [zdaj])
+                conn.execute(self.sql_dodaj, [seja.id, ime, uid, seja.rok])
+        with self.lock:
+            self.zapomni(seja, seja.rok)
+        return seja
+
+    def preberi(self, id):
+        """
+        Vrne veljavno sejo z danim id in ji podaljša rok
+        ali None, če take seje ni.
+        Če se seje hranijo v bazi, ob vsakem branju brez zaklenjene
+        ključavnice preveri, ali je seja še v bazi; seje, ki je ni
+        v pomnilniku, ne vrne, če je bila medtem odstranjena katera od sej.
+        """
+        if not id:
+            return None
+        zdaj = time.time()
+        with self.lock:
+            generacija = self.generacija
+        conn = self.povezava()
+        if conn is not None:
+            vrstica = conn.execute(self.sql_preberi, [id, zdaj]).fetchone()
+            if vrstica is None:
+                with self.lock:
+                    self.pozabi(id)
+                return None
+        with self.lock:
+            seja = self.seje.get(id)
+            if seja is not None and seja.rok <= zdaj:
+                self.pozabi(id)
+                seja = None
+            if seja is None:
+                if conn is None or generacija != self.generacija:
+                    return None
+                seja = Seja(id, *vrstica)
+                self.zapomni(seja, seja.rok)
+            self.seje.move_to_end(id)
+            seja.rok = zdaj + self.trajanje
+            podaljsaj = conn is not None and \
+                seja.rok - self.zapisani[id] > self.trajanje / 10
+            if podaljsaj:
+                self.zapisani[id] = seja.rok
+        if podaljsaj:
+            with conn:
+                conn.execute(self.sql_podaljsaj, [seja.rok, id])
+        return seja
+
+    def odstrani(self, id):
+        """
+        Odstrani sejo z danim id.
+        """
+        if not id:
+            return
+        with self.lock:
+            self.pozabi(id)
+            self.generacija += 1
+        conn = self.povezava()
+        if conn is not None:
+            with conn:
+                conn.execute(self.sql_odstrani, [id])
@@ -1,273 +1,752 @@
-import json
-import random
-import bottle
-from sqlite3 import IntegrityError
-import sqlite3
-from model import LoginError, Uporabnik, Zival, Oseba, Prostor, Cepljenja, Posvojitev, Namestitev #, Cepiva
-
-NASTAVITVE = 'nastavitve.json'
-
-try:
-    with open(NASTAVITVE) as f:
-        nastavitve = json.load(f)
-        SKRIVNOST = nastavitve['skrivnost']
-except FileNotFoundError:
-    SKRIVNOST = "".join(chr(random.randrange(32, 128)) for _ in range(32))
-    with open(NASTAVITVE, "w") as f:
-        json.dump({'skrivnost': SKRIVNOST}, f)
-
-
-def zahtevaj_prijavo():
-    if bottle.request.get_cookie('uporabnik', secret=SKRIVNOST) != 'admin':
-        bottle.abort(401, 'Nimate pravice za urejanje!')
-
-
-def zahtevaj_odjavo():
-    if bottle.request.get_cookie('uporabnik', secret=SKRIVNOST):
-        bottle.redirect('/')
-
-
-@bottle.get('/prijava/')
-def prijava():
-    zahtevaj_odjavo()
-    return bottle.template(
-        'prijava.html',
-        napaka=None, ime=""
-    )
-
-
-@bottle.post('/prijava/')
-def prijava_post():
-    zahtevaj_odjavo()
-    ime = bottle.request.forms['uporabnisko_ime']
-    geslo = bottle.request.forms['geslo']
-    try:
-        uporabnik = Uporabnik.prijava(ime, geslo)
-        bottle.response.set_cookie('uporabnik', ime, path='/', secret=SKRIVNOST)
-        bottle.response.set_cookie('uid', uporabnik.id, path='/', secret=SKRIVNOST)
-        bottle.redirect('/')
-    except LoginError:
-        return bottle.template(
-            'prijava.html',
-            napaka='Uporabniško ime in geslo se ne ujemata!',
-            ime=ime
-        )
-
-
-@bottle.get('/vpis/')
-def vpis():
-    zahtevaj_odjavo()
-    return bottle.template(
-        'vpis.html',
-        napaka=None, ime=""
-    )
-
-
-@bottle.post('/vpis/')
-def vpis_post():
-    zahtevaj_odjavo()
-    ime = bottle.request.forms['uporabnisko_ime']
-    geslo1 = bottle.request.forms['geslo1']
-    geslo2 = bottle.request.forms['geslo2']
-    if geslo1 != geslo2:
-        return bottle.template(
-            'vpis.html',
-            napaka='Gesli se ne ujemata!',
-            ime=ime
-        )
-    try:
-        uporabnik = Uporabnik(ime)
-        uporabnik.dodaj_v_bazo(geslo1)
-        bottle.response.set_cookie('uporabnik', ime, path='/', secret=SKRIVNOST)
-        bottle.response.set_cookie('uid', uporabnik.id, path='/', secret=SKRIVNOST)
-        bottle.redirect('/')
-    except IntegrityError:
-        return bottle.template(
-            'vpis.html',
-            napaka='Uporabniško ime že obstaja!',
-            ime=ime
-        )
-
-
-@bottle.get('/odjava/')
-def odjava():
-    bottle.response.delete_cookie('uporabnik', path='/')
-    bottle.redirect('/')
-
-
-@bottle.get('/')
-def zacetna_stran():
-    return bottle.template(
-        'zacetna_stran.html',
-        leta=range(1950, 2020),
-        ime=bottle.request.get_cookie('uporabnik', secret=SKRIVNOST)
-    )
-
-
-@bottle.get('/dodaj-osebo/')
-def dodaj_osebo():
-    zahtevaj_prijavo()
-    return bottle.template(
-        'dodaj_osebo.html',
-        napaka=None, ime="", priimek = "", mail = ""
-    )
-
-
-@bottle.post('/dodaj-osebo/')
-def dodaj_osebo_post():
-    zahtevaj_prijavo()
-    ime = bottle.request.forms.getunicode('ime')
-    priimek = bottle.request.forms.getunicode('priimek')
-    mail = bottle.request.forms.getunicode('mail')
-    
-   
-    oseba = Oseba(ime, priimek, mail)
-    oseba.dodaj_v_bazo()
-    bottle.redirect('/')
-    
- #ZIVAL
-@bottle.get('/dodaj-zival/')
-def dodaj_zival():
-    zahtevaj_prijavo()
-    return bottle.template(
-        'dodaj_zival.html',
-         napaka=None, ime="", vrsta ="", spol="", dat_roj = "", dat_spr = "", bolezni =""
-     )
-
-
-@bottle.post('/dodaj-zival/') 
-def dodaj_zival_post():
-    zahtevaj_prijavo()
-    ime = bottle.request.forms.getunicode('ime')
-    vrsta = bottle.request.forms.getunicode('vrsta')
-    spol = bottle.request.forms.getunicode('spol')
-    dat_roj = bottle.request.forms.getunicode('dat_roj')
-    dat_spr = bottle.request.forms.getunicode('dat_spr')
-    bolezni = bottle.request.forms.getunicode('bolezni')
-    prostor = list(Prostor.aliJeProstor(vrsta))
-    if (len(prostor) != 0):
-        zasedenost = prostor[0].zasedenost + 1
-        id = prostor[0].id
-        prostor[0].napolni_izprazni(zasedenost, id)
-        zival = Zival(ime, vrsta, spol, dat_roj, dat_spr, bolezni)
-        zival.dodaj_v_bazo()
-        Zival.namesti(zival.id, id)
-        bottle.redirect('/')
-    else:
-        return bottle.template(
-            'dodaj_zival.html',
-            napaka='V zavetišču za to vrsto živali žal ni več prostora.',
-             ime="", vrsta ="", spol="", dat_roj = "", dat_spr = "", bolezni =""
-            )
-
-#cepljenje
-@bottle.get('/dodaj-cepljenje/')
-def dodaj_cepljenje():
-    zahtevaj_prijavo()
-    return bottle.template(
-        'dodaj_cepljenje.html',
-        napaka=None, id_z="", id_c =""
-    )
-
-
-@bottle.post('/dodaj-cepljenje/')
-def dodaj_cepljenje_post():
-    zahtevaj_prijavo()
-    id_z = bottle.request.forms.getunicode('id_z')
-    id_c = bottle.request.forms.getunicode('id_c')
-    
-    zival = list(Zival.obst(id_z))
-    if (len(zival) != 0):
-      cepljenje = Cepljenja(id_z, id_c)
-      cepljenje.dodaj_v_bazo()
-      bottle.redirect('/')
-    else:
-        return bottle.template(
-            'dodaj_cepljenje.html',
-            napaka='Žival s tem ID ne obstaja!',
-             id_z="", 
-             id_c =""
-            )
-
-
-#posvojitve
-@bottle.get('/posvojitev/')
-def dodaj_posvojitev():
-    zahtevaj_prijavo()
-    return bottle.template(
-        'dodaj_posvojitev.html',
-        napaka=None, id_z="", id_o ="", datum = ""
-    )
-
-
-@bottle.post('/posvojitev/')
-def dodaj_posvojitev_post():
-    zahtevaj_prijavo()
-    id_z = bottle.request.forms.getunicode('id_z')
-    id_o = bottle.request.forms.getunicode('id_o')
-    datum = bottle.request.forms.getunicode('datum')
-    
-    zival = list(Zival.obst(id_z))
-    oseba = list(Oseba.obst(id_o))
-    pos = list(Zival.posvojena(id_z))
-    if (len(zival) != 0 and len(oseba) != 0 and len(pos) == 0):
-      posvojitev = Posvojitev(id_z, id_o, datum)
-      posvojitev.dodaj_v_bazo()
-      nah = list(Zival.nahajalisce(id_z))[0]
-      id_nah = nah.id
-      zas_nah = nah.zasedenost - 1
-      Prostor.napolni_izprazni(zas_nah, id_nah)
-      Zival.odstrani_nah(id_z)
-      bottle.redirect('/')
-    else:
-        return bottle.template(
-            'dodaj_posvojitev.html',
-            napaka='Žival ali oseba s tem ID ne obstaja ali je že posvojena!',
-             id_z="", 
-             id_o ="",
-             datum = ""
-            )
-
-
-
-@bottle.get('/isci-o/')
-def isci():
-    iskalni_niz = bottle.request.query.getunicode('iskalni_niz')
-    osebe = Oseba.poisci(iskalni_niz)
-    return bottle.template(
-        'rezultati_iskanja.html',
-        iskalni_niz=iskalni_niz,
-        osebe=osebe
-    )
-@bottle.get('/isci-z/')
-def isci():
-    iskalni_niz = bottle.request.query.getunicode('iskalni_niz')
-    zivali = Zival.poisci(iskalni_niz)
-    return bottle.template(
-        'rezultati_iskanja_z.html',
-        iskalni_niz=iskalni_niz,
-        zivali=zivali
-    )
-
-
-@bottle.get('/prostori/')
-def isci():
-    prostori = Prostor.vsi()
-    namestitve = Namestitev.vsi()
-    return bottle.template(
-        'prostori.html',
-        prostori = prostori,
-        namestitve = namestitve
-    )
-
-@bottle.get('/precepljenost/')
-def isci():
-    precepljenost = Cepljenja.vsa()
-    return bottle.template(
-        'precepljenost.html',
-        precepljenost = precepljenost
-       
-    )
-
-
-bottle.run(debug=True, reloader=True)
\ No newline at end of file
+import argparse
+import bottle
+import csv
+import io
+import json
+from sqlite3 import IntegrityError
+import sqlite3
+from functools import wraps
+from types import GeneratorType
+from urllib.parse import urlencode
+from geslo import bazen_gesel, PreobremenitevError
+from nastavitve import nastavitve
+from omejevalnik import Omejevalnik
+from pomozne_funkcije import normaliziraj_datum
+from predloge import prevedi_predloge, pretok
+from seje import Seje
+from model import bazen, pripravi_bazo, predpomnilnik_iskanja, zapisi_kljuc, razberi_kljuc, NA_STRAN, LoginError, Uporabnik, Zival, Oseba, Prostor, Cepljenja, Posvojitev, Namestitev #, Cepiva
+
+omejevalnik = Omejevalnik(**nastavitve.get('omejevanje', {}))
+
+NASTAVITVE_SEJ = dict(nastavitve.get('seje', {}))
+seje = Seje(bazen=bazen if NASTAVITVE_SEJ.pop('obstojne', False) else None, **NASTAVITVE_SEJ)
+
+
+def povezava_na_zahtevo(povratni_klic):
+    """
+    Vtičnik, ki vsaki zahtevi za čas obdelave dodeli povezavo iz bazena.
+    Če zahteva vrne generator, povezavo obdrži, dokler se generator ne izteče.
+    """
+    @wraps(povratni_klic)
+    def ovoj(*largs, **kwargs):
+        bazen.prevzemi()
+        try:
+            izhod = povratni_klic(*largs, **kwargs)
+        except BaseException:
+            bazen.vrni()
+            raise
+        if isinstance(izhod, GeneratorType):
+            return s_povezavo(izhod)
+        bazen.vrni()
+        return izhod
+    return ovoj
+
+
+def s_povezavo(izhod):
+    """
+    Vrača kose iz generatorja in na koncu vrne povezavo v bazen.
+    """
+    try:
+        yield from izhod
+    finally:
+        bazen.vrni()
+
+
+bottle.install(povezava_na_zahtevo)
+
+
+def trenutna_seja():
+    """
+    Vrne sejo iz piškotka trenutne zahteve ali None,
+    če uporabnik ni prijavljen.
+    """
+    okolje = bottle.request.environ
+    if 'zavetisce.seja' not in okolje:
+        okolje['zavetisce.seja'] = seje.preberi(bottle.request.get_cookie('seja'))
+    return okolje['zavetisce.seja']
+
+
+def trenutni_uporabnik():
+    """
+    Vrne uporabniško ime prijavljenega uporabnika ali None.
+    """
+    seja = trenutna_seja()
+    return seja.ime if seja else None
+
+
+def prijavi(uporabnik):
+    """
+    Uporabniku ustvari sejo in mu nastavi piškotek z njenim id.
+    """
+    seja = seje.ustvari(uporabnik.ime, uporabnik.id)
+    bottle.response.set_cookie('seja', seja.id, path='/', httponly=True,
+                               samesite='lax', max_age=seje.trajanje)
+
+
+def zahtevaj_prijavo():
+    if trenutni_uporabnik() != 'admin':
+        bottle.abort(401, 'Nimate pravice za urejanje!')
+
+
+def preobremenjen():
+    """
+    Zahtevo zavrne s statusom 503, ker je bazen gesel preobremenjen.
+    """
+    raise bottle.HTTPError(503, 'Strežnik je preobremenjen, poskusite znova čez nekaj trenutkov.',
+                           **{'Retry-After': '1'})
+
+
+def omejeno(povratni_klic):
+    """
+    Dekorator, ki zahteve, pri katerih se zgošča geslo, omeji
+    po naslovu odjemalca in uporabniškem imenu.
+    Preveč pogoste zahteve zavrne s statusom 429, še preden se geslo zgosti.
+    """
+    @wraps(povratni_klic)
+    def ovoj(*largs, **kwargs):
+        naslov = bottle.request.environ.get('REMOTE_ADDR', '')
+        ime = bottle.request.forms.get('uporabnisko_ime', '').lower()
+        cakanje = omejevalnik.porabi([('naslov', naslov), ('ime', ime)])
+        if cakanje:
+            raise bottle.HTTPError(429, 'Preveč poskusov, poskusite znova čez nekaj časa.',
+                                   **{'Retry-After': str(cakanje)})
+        return povratni_klic(*largs, **kwargs)
+    return ovoj
+
+
+def zahtevaj_odjavo():
+    if trenutna_seja():
+        bottle.redirect('/')
+
+
+@bottle.get('/prijava/')
+def prijava():
+    zahtevaj_odjavo()
+    return bottle.template(
+        'prijava.html',
+        napaka=None, ime=""
+    )
+
+
+@bottle.post('/prijava/')
+@omejeno
+def prijava_post():
+    zahtevaj_odjavo()
+    ime = bottle.request.forms['uporabnisko_ime']
+    geslo = bottle.request.forms['geslo']
+    try:
+        uporabnik = Uporabnik.prijava(ime, geslo)
+        prijavi(uporabnik)
+        bottle.redirect('/')
+    except LoginError:
+        return bottle.template(
+            'prijava.html',
+            napaka='Uporabniško ime in geslo se ne ujemata!',
+            ime=ime
+        )
+    except PreobremenitevError:
+        preobremenjen()
+
+
+@bottle.get('/vpis/')
+def vpis():
+    zahtevaj_odjavo()
+    return bottle.template(
+        'vpis.html',
+        napaka=None, ime=""
+    )
+
+
+@bottle.post('/vpis/')
+@omejeno
+def vpis_post():
+    zahtevaj_odjavo()
+    ime = bottle.request.forms['uporabnisko_ime']
+    geslo1 = bottle.request.forms['geslo1']
+    geslo2 = bottle.request.forms['geslo2']
+    if geslo1 != geslo2:
+        return bottle.template(
+            'vpis.html',
+            napaka='Gesli se ne ujemata!',
+            ime=ime
+        )
+    try:
+        uporabnik = Uporabnik(ime)
+        uporabnik.dodaj_v_bazo(geslo1)
+        prijavi(uporabnik)
+        bottle.redirect('/')
+    except IntegrityError:
+        return bottle.template(
+            'vpis.html',
+            napaka='Uporabniško ime že obstaja!',
+            ime=ime
+        )
+    except PreobremenitevError:
+        preobremenjen()
+
+
+@bottle.get('/odjava/')
+def odjava():
+    seje.odstrani(bottle.request.get_cookie('seja'))
+    bottle.response.delete_cookie('seja', path='/')
+    bottle.redirect('/')
+
+
+@bottle.get('/')
+def zacetna_stran():
+    return bottle.template(
+        'zacetna_stran.html',
+        leta=range(1950, 2020),
+        ime=trenutni_uporabnik()
+    )
+
+
+@bottle.get('/dodaj-osebo/')
+def dodaj_osebo():
+    zahtevaj_prijavo()
+    return bottle.template(
+        'dodaj_osebo.html',
+        napaka=None, ime="", priimek = "", mail = ""
+    )
+
+
+@bottle.post('/dodaj-osebo/')
+def dodaj_osebo_post():
+    zahtevaj_prijavo()
+    ime = bottle.request.forms.getunicode('ime')
+    priimek = bottle.request.forms.getunicode('priimek')
+    mail = bottle.request.forms.getunicode('mail')
+    
+   
+    oseba = Oseba(ime, priimek, mail)
+    oseba.dodaj_v_bazo()
+    bottle.redirect('/')
+    
+ #ZIVAL
+@bottle.get('/dodaj-zival/')
+def dodaj_zival():
+    zahtevaj_prijavo()
+    return bottle.template(
+        'dodaj_zival.html',
+         napaka=None, ime="", vrsta ="", spol="", dat_roj = "", dat_spr = "", bolezni =""
+     )
+
+
+@bottle.post('/dodaj-zival/') 
+def dodaj_zival_post():
+    zahtevaj_prijavo()
+    ime = bottle.request.forms.getunicode('ime')
+    vrsta = bottle.request.forms.getunicode('vrsta')
+    spol = bottle.request.forms.getunicode('spol')
+    dat_roj = bottle.request.forms.getunicode('dat_roj')
+    dat_spr = bottle.request.forms.getunicode('dat_spr')
+    bolezni = bottle.request.forms.getunicode('bolezni')
+    zival = Zival(ime, vrsta, spol, dat_roj, dat_spr, bolezni)
+    try:
+        zival.vrstica()
+    except ValueError:
+        return bottle.template(
+            'dodaj_zival.html',
+            napaka='Neveljaven datum.',
+             ime=ime, vrsta=vrsta, spol=spol, dat_roj=dat_roj, dat_spr=dat_spr, bolezni=bolezni
+            )
+    if zival.sprejmi() is not None:
+        bottle.redirect('/')
+    else:
+        return bottle.template(
+            'dodaj_zival.html',
+            napaka='V zavetišču za to vrsto živali žal ni več prostora.',
+             ime="", vrsta ="", spol="", dat_roj = "", dat_spr = "", bolezni =""
+            )
+
+STOLPCI_ZIVALI = ["ime", "vrsta", "spol", "dat_roj", "dat_spr", "bolezni"]
+
+
+def preberi_zivali(besedilo):
+    """
+    Iz besedila v obliki CSV prebere živali za sprejem.
+
+    Če prva vrstica vsebuje stolpec ime, je to glava in stolpci se berejo
+    po imenih, tako da je njihov vrstni red poljuben (kot v podatki/zival.csv,
+    kjer je tudi stolpec id, ki se ne uporabi). Sicer vsaka vrstica vsebuje
+    stolpce iz STOLPCI_ZIVALI v tem vrstnem redu.
+    Vrne seznam trojic (številka vrstice, žival, napaka),
+    kjer je žival None, če vrstica ni veljavna.
+    Če glava vsebuje neznane stolpce, sproži ValueError.
+    """
+    glava = [polje.strip().lower() for polje in next(csv.reader(io.StringIO(besedilo)), [])]
+    if "ime" in glava:
+        neznani = [stolpec for stolpec in glava if stolpec not in STOLPCI_ZIVALI + ["id"]]
+        if neznani:
+            raise ValueError("Neznani stolpci v glavi: {}.".format(", ".join(neznani)))
+        bralnik = csv.DictReader(io.StringIO(besedilo), fieldnames=glava)
+        next(bralnik)
+        zapisi = enumerate(([zapis.get(stolpec) or "" for stolpec in STOLPCI_ZIVALI]
+                            for zapis in bralnik), 2)
+    else:
+        zapisi = enumerate(csv.reader(io.StringIO(besedilo)), 1)
+    vrstice = []
+    for stevilka, vrstica in zapisi:
+        vrstica = [polje.strip() for polje in vrstica]
+        if not any(vrstica):
+            continue
+        vrstica += [""] * (len(STOLPCI_ZIVALI) - len(vrstica))
+        ime, vrsta, spol, dat_roj, dat_spr, bolezni = vrstica[:len(STOLPCI_ZIVALI)]
+        vrsta, spol = vrsta.upper(), spol.upper()
+        if not ime or not dat_spr:
+            napaka = 'Manjka ime ali datum sprejema.'
+        elif vrsta not in ('P', 'M'):
+            napaka = 'Neznana vrsta živali.'
+        elif spol not in ('M', 'Z'):
+            napaka = 'Neznan spol živali.'
+        else:
+            try:
+                dat_roj, dat_spr = normaliziraj_datum(dat_roj), normaliziraj_datum(dat_spr)
+            except ValueError:
+                napaka = 'Neveljaven datum.'
+            else:
+                vrstice.append((stevilka, Zival(ime, vrsta, spol, dat_roj, dat_spr, bolezni), None))
+                continue
+        vrstice.append((stevilka, None, napaka))
+    return vrstice
+
+
+@bottle.get('/dodaj-zivali/')
+def dodaj_zivali():
+    zahtevaj_prijavo()
+    return bottle.template(
+        'dodaj_zivali.html',
+        napaka=None, zivali="", porocilo=None
+    )
+
+
+@bottle.post('/dodaj-zivali/')
+def dodaj_zivali_post():
+    zahtevaj_prijavo()
+    zivali = bottle.request.forms.getunicode('zivali') or ""
+    datoteka = bottle.request.files.get('datoteka')
+    try:
+        if datoteka is not None and datoteka.filename:
+            besedilo = datoteka.file.read().decode('utf-8-sig')
+        else:
+            besedilo = zivali
+        vrstice = preberi_zivali(besedilo)
+    except UnicodeDecodeError:
+        return bottle.template(
+            'dodaj_zivali.html',
+            napaka='Datoteka ni v kodiranju UTF-8.', zivali=zivali, porocilo=None
+        )
+    except ValueError as napaka:
+        return bottle.template(
+            'dodaj_zivali.html',
+            napaka=str(napaka), zivali=zivali, porocilo=None
+        )
+    veljavne = [zival for stevilka, zival, napaka in vrstice if zival is not None]
+    if not vrstice:
+        return bottle.template(
+            'dodaj_zivali.html',
+            napaka='Ni podatkov o živalih.', zivali=zivali, porocilo=None
+        )
+    prostori = iter(Zival.sprejmi_paket(veljavne) if veljavne else [])
+    porocilo = []
+    for stevilka, zival, napaka in vrstice:
+        id_p = None if zival is None else next(prostori)
+        if zival is not None and id_p is None:
+            napaka = 'V zavetišču za to vrsto živali žal ni več prostora.'
+        porocilo.append((stevilka, zival, id_p, napaka))
+    return bottle.template(
+        'dodaj_zivali.html',
+        napaka=None, zivali="", porocilo=porocilo
+    )
+
+#cepljenje
+@bottle.get('/dodaj-cepljenje/')
+def dodaj_cepljenje():
+    zahtevaj_prijavo()
+    return bottle.template(
+        'dodaj_cepljenje.html',
+        napaka=None, id_z="", id_c =""
+    )
+
+
+@bottle.post('/dodaj-cepljenje/')
+def dodaj_cepljenje_post():
+    zahtevaj_prijavo()
+    id_z = bottle.request.forms.getunicode('id_z')
+    id_c = bottle.request.forms.getunicode('id_c')
+    
+    zival = list(Zival.obst(id_z))
+    if (len(zival) != 0):
+      cepljenje = Cepljenja(id_z, id_c)
+      cepljenje.dodaj_v_bazo()
+      bottle.redirect('/')
+    else:
+        return bottle.template(
+            'dodaj_cepljenje.html',
+            napaka='Žival s tem ID ne obstaja!',
+             id_z="", 
+             id_c =""
+            )
+
+
+#posvojitve
+@bottle.get('/posvojitev/')
+def dodaj_posvojitev():
+    zahtevaj_prijavo()
+    return bottle.template(
+        'dodaj_posvojitev.html',
+        napaka=None, id_z="", id_o ="", datum = ""
+    )
+
+
+@bottle.post('/posvojitev/')
+def dodaj_posvojitev_post():
+    zahtevaj_prijavo()
+    id_z = bottle.request.forms.getunicode('id_z')
+    id_o = bottle.request.forms.getunicode('id_o')
+    datum = bottle.request.forms.getunicode('datum')
+    vrstice = preberi_posvojitve([[id_z or "", id_o or "", datum or ""]])
+    if not vrstice:
+        napaka = 'Manjkajo podatki o posvojitvi.'
+    else:
+        stevilka, posvojitev, napaka = vrstice[0]
+        if posvojitev is not None:
+            napaka, = Posvojitev.posvoji_paket([posvojitev])
+    if napaka is None:
+        bottle.redirect('/')
+    return bottle.template(
+        'dodaj_posvojitev.html',
+        napaka=napaka,
+        id_z=id_z or "",
+        id_o=id_o or "",
+        datum=datum or ""
+    )
+
+
+def preberi_posvojitve(vrstice):
+    """
+    Iz vrstic s stolpci id živali, id osebe in datum prebere posvojitve.
+
+    Vrne seznam trojic (številka vrstice, posvojitev, napaka),
+    kjer je posvojitev None, če vrstica ni veljavna.
+    """
+    posvojitve = []
+    for stevilka, vrstica in enumerate(vrstice, 1):
+        vrstica = [polje.strip() for polje in vrstica]
+        if not any(vrstica):
+            continue
+        vrstica += [""] * (3 - len(vrstica))
+        id_z, id_o, datum = vrstica[:3]
+        try:
+            id_z, id_o = int(id_z), int(id_o)
+        except ValueError:
+            posvojitve.append((stevilka, None, 'ID živali in osebe morata biti števili.'))
+            continue
+        try:
+            posvojitve.append((stevilka, Posvojitev(id_z, id_o, normaliziraj_datum(datum)), None))
+        except ValueError as napaka:
+            posvojitve.append((stevilka, None, '{}.'.format(napaka)))
+    return posvojitve
+
+
+@bottle.get('/posvojitve/')
+def dodaj_posvojitve():
+    zahtevaj_prijavo()
+    return bottle.template(
+        'dodaj_posvojitve.html',
+        napaka=None, posvojitve="", porocilo=None
+    )
+
+
+@bottle.post('/posvojitve/')
+def dodaj_posvojitve_post():
+    zahtevaj_prijavo()
+    posvojitve = bottle.request.forms.getunicode('posvojitve') or ""
+    vrstice = preberi_posvojitve(csv.reader(io.StringIO(posvojitve)))
+    if not vrstice:
+        return bottle.template(
+            'dodaj_posvojitve.html',
+            napaka='Ni podatkov o posvojitvah.', posvojitve=posvojitve, porocilo=None
+        )
+    veljavne = [posvojitev for stevilka, posvojitev, napaka in vrstice if posvojitev is not None]
+    napake = iter(Posvojitev.posvoji_paket(veljavne) if veljavne else [])
+    porocilo = [(stevilka, posvojitev, napaka if posvojitev is None else next(napake))
+                for stevilka, posvojitev, napaka in vrstice]
+    return bottle.template(
+        'dodaj_posvojitve.html',
+        napaka=None, posvojitve="", porocilo=porocilo
+    )
+
+
+NAJVEC_NA_STRAN = 500
+
+
+def listanje(predpona='', najvec=NAJVEC_NA_STRAN):
+    """
+    Iz poizvedbe prebere parametre za listanje.
+    Ključa after_id in before_id imata lahko predpono,
+    če je na strani več seznamov.
+    Velikost strani je omejena na najvec elementov.
+    """
+    def stevilo(ime, pretvori=int):
+        vrednost = bottle.request.query.get(ime)
+        if not vrednost:
+            return None
+        try:
+            return pretvori(vrednost)
+        except ValueError:
+            bottle.abort(400, 'Neveljaven parameter {}!'.format(ime))
+    limit = min(stevilo('limit') or NA_STRAN, najvec)
+    return dict(
+        after_id=stevilo(predpona + 'after_id', razberi_kljuc),
+        before_id=stevilo(predpona + 'before_id', razberi_kljuc),
+        limit=limit
+    )
+
+
+def stran_ali_napaka(funkcija, *largs, **kwargs):
+    """
+    Vrne stran, ki jo vrne funkcija modela.
+    Če model zavrne parametre (npr. ključ strani napačne oblike),
+    zahtevo zavrne s statusom 400.
+    """
+    try:
+        return funkcija(*largs, **kwargs)
+    except ValueError as napaka:
+        bottle.abort(400, str(napaka))
+
+
+def url_strani(**parametri):
+    """
+    Vrne naslov trenutne strani s spremenjenimi parametri poizvedbe.
+    Parametri z vrednostjo None se odstranijo,
+    ključi strani se zapišejo z zapisi_kljuc.
+    """
+    poizvedba = dict(bottle.request.query.decode().allitems())
+    poizvedba.update(parametri)
+    poizvedba = {k: zapisi_kljuc(v) for k, v in poizvedba.items() if v is not None}
+    return '?' + urlencode(poizvedba)
+
+
+@bottle.get('/isci-o/')
+def isci():
+    iskalni_niz = bottle.request.query.getunicode('iskalni_niz')
+    osebe = stran_ali_napaka(Oseba.poisci, iskalni_niz, **listanje())
+    return pretok(
+        'rezultati_iskanja.html',
+        iskalni_niz=iskalni_niz,
+        osebe=osebe,
+        url_strani=url_strani
+    )
+@bottle.get('/isci-z/')
+def isci():
+    iskalni_niz = bottle.request.query.getunicode('iskalni_niz')
+    zivali = stran_ali_napaka(Zival.poisci, iskalni_niz, **listanje())
+    return pretok(
+        'rezultati_iskanja_z.html',
+        iskalni_niz=iskalni_niz,
+        zivali=zivali,
+        url_strani=url_strani
+    )
+
+
+@bottle.get('/predpomnilnik/')
+def statistika_predpomnilnika():
+    zahtevaj_prijavo()
+    return {'iskanje': predpomnilnik_iskanja.statistika()}
+
+
+@bottle.get('/prostori/')
+def isci():
+    prostori = stran_ali_napaka(Prostor.vsi, **listanje())
+    namestitve = stran_ali_napaka(Namestitev.vsi, **listanje('n_'))
+    return pretok(
+        'prostori.html',
+        prostori = prostori,
+        namestitve = namestitve,
+        url_strani=url_strani
+    )
+
+@bottle.get('/precepljenost/')
+def isci():
+    pokritost = Cepljenja.pokritost()
+    cepivo = bottle.request.query.get('cepivo', type=int)
+    necepljene = stran_ali_napaka(Cepljenja.necepljene, cepivo, **listanje()) \
+        if cepivo is not None else None
+    return pretok(
+        'precepljenost.html',
+        pokritost = pokritost,
+        cepivo = cepivo,
+        necepljene = necepljene,
+        url_strani=url_strani
+    )
+
+
+API_NAJVEC_NA_STRAN = 10000
+
+API = {
+    'zivali': (Zival.vse, Zival.poisci, Zival.pogoji,
+               ['id', 'ime', 'vrsta', 'spol', 'dat_roj', 'dat_spr', 'bolezni']),
+    'osebe': (Oseba.vse, Oseba.poisci, Oseba.pogoji,
+              ['id', 'ime', 'priimek', 'mail']),
+    'prostori': (Prostor.vsi, None, Prostor.pogoji,
+                 ['id', 'oddelek', 'kapaciteta', 'zasedenost']),
+    'cepljenja': (Cepljenja.vsa, None, Cepljenja.pogoji,
+                  ['id', 'id_z', 'id_c']),
+    'posvojitve': (Posvojitev.vse, None, Posvojitev.pogoji,
+                   ['id', 'id_z', 'id_o', 'datum']),
+}
+
+
+def json_pretok(stran, polja, velikost=16384):
+    """
+    Vrne generator, ki stran izpisuje kot JSON po kosih
+    velikosti približno velikost znakov.
+    Elementi se pretvarjajo sproti, tako da se celoten odgovor
+    nikoli ne hrani v pomnilniku.
+    Ključa sosednjih strani sta na koncu odgovora, ker sta znana šele,
+    ko se stran prebere do konca; zapisana sta tako,
+    kot se podata v parametrih after_id in before_id.
+    """
+    koder = json.JSONEncoder(ensure_ascii=False)
+    kosi = ['{"podatki": [']
+    dolzina = 0
+    for i, element in enumerate(stran):
+        niz = koder.encode({polje: getattr(element, polje) for polje in polja})
+        kosi.append("," + niz if i else niz)
+        dolzina += len(niz)
+        if dolzina >= velikost:
+            yield "".join(kosi)
+            kosi = []
+            dolzina = 0
+    kosi.append('], "prejsnja": {}, "naslednja": {}}}'.format(
+        koder.encode(zapisi_kljuc(stran.prejsnja)), koder.encode(zapisi_kljuc(stran.naslednja))))
+    yield "".join(kosi)
+
+
+@bottle.error(400)
+@bottle.error(404)
+@bottle.error(405)
+def napaka_api(napaka):
+    """
+    Napake pri zahtevah na /api/ vrne kot JSON {"napaka": sporočilo},
+    ostale pa kot običajno stran z napako.
+    """
+    if not bottle.request.path.startswith('/api/'):
+        return bottle.default_app().default_error_handler(napaka)
+    bottle.response.content_type = 'application/json; charset=UTF-8'
+    return json.dumps({"napaka": napaka.body}, ensure_ascii=False)
+
+
+@bottle.get('/api/v1/<vir>')
+def api_seznam(vir):
+    """
+    Vrne stran elementov vira v obliki JSON.
+
+    Parametri poizvedbe:
+    - polja: z vejicami ločen seznam polj, ki naj bodo v odgovoru
+    - limit, after_id, before_id: listanje kot na straneh z rezultati;
+      pri iskanju je ključ strani niz "ustreznost,id"
+    - iskanje: iskalni niz (le za živali in osebe), ki se ne kombinira z filtri
+    - filtri iz slovarja pogoji ustreznega razreda v modelu
+    """
+    if vir not in API:
+        bottle.abort(404, 'Neznan vir {}!'.format(vir))
+    vse, poisci, pogoji, polja = API[vir]
+    if bottle.request.query.get('polja'):
+        izbrana = bottle.request.query.polja.split(',')
+        neznana = [polje for polje in izbrana if polje not in polja]
+        if neznana:
+            bottle.abort(400, 'Neznana polja: {}!'.format(', '.join(neznana)))
+        polja = izbrana
+    filtri = {ime: bottle.request.query.getunicode(ime)
+              for ime in pogoji if ime in bottle.request.query}
+    iskalni_niz = bottle.request.query.getunicode('iskanje')
+    try:
+        if iskalni_niz is None:
+            stran = vse(**filtri, **listanje(najvec=API_NAJVEC_NA_STRAN))
+        elif poisci is None or filtri:
+            bottle.abort(400, 'Iskanje ni mogoče pri tem viru ali skupaj s filtri!')
+        else:
+            stran = poisci(iskalni_niz, **listanje(najvec=API_NAJVEC_NA_STRAN))
+    except ValueError as napaka:
+        bottle.abort(400, str(napaka))
+    bottle.response.content_type = 'application/json; charset=UTF-8'
+    return json_pretok(stran, polja)
+
+
+STREZNIK = {
+    'nacin': 'razvoj',
+    'adapter': 'waitress',
+    'gostitelj': '127.0.0.1',
+    'vrata': 8080,
+    'niti': 8,
+    'delavci': 1,
+}
+
+MOZNOSTI_ADAPTERJA = {
+    'waitress': lambda niti, delavci: {'threads': niti},
+    'cheroot': lambda niti, delavci: {'numthreads': niti},
+    'gunicorn': lambda niti, delavci: {
+        'workers': delavci, 'threads': niti, 'worker_class': 'gthread'
+    },
+}
+
+
+def preberi_argumente():
+    """
+    Prebere argumente ukazne vrstice.
+    Privzete vrednosti vzame iz razdelka streznik v nastavitvah.
+    """
+    privzeto = dict(STREZNIK)
+    privzeto.update(nastavitve.get('streznik', {}))
+    parser = argparse.ArgumentParser(description='Spletni vmesnik zavetišča.')
+    parser.add_argument('--produkcija', dest='nacin', action='store_const',
+                        const='produkcija', default=privzeto['nacin'],
+                        help='zaženi brez razhroščevanja in samodejnega nalaganja')
+    parser.add_argument('--adapter', default=privzeto['adapter'],
+                        choices=sorted(MOZNOSTI_ADAPTERJA),
+                        help='strežnik za produkcijski način')
+    parser.add_argument('--gostitelj', default=privzeto['gostitelj'])
+    parser.add_argument('--vrata', type=int, default=privzeto['vrata'])
+    parser.add_argument('--niti', type=int, default=privzeto['niti'],
+                        help='število niti na delavca')
+    parser.add_argument('--delavci', type=int, default=privzeto['delavci'],
+                        help='število procesov (le za gunicorn)')
+    return parser.parse_args()
+
+
+def zazeni():
+    """
+    Zažene spletni strežnik v razvojnem ali produkcijskem načinu.
+
+    Bazo pripravi šele tu in ne ob uvozu modula, ker procesi bazena gesel
+    ob zagonu znova uvozijo glavni modul programa.
+    """
+    argumenti = preberi_argumente()
+    pripravi_bazo()
+    print("Nastavitve SQLite:", ", ".join(
+        "{}={}".format(ime, vrednost) for ime, vrednost in bazen.porocilo().items()))
+    if argumenti.nacin != 'produkcija':
+        bottle.run(host=argumenti.gostitelj, port=argumenti.vrata,
+                   debug=True, reloader=True)
+        return
+    bottle.debug(False)
+    if bazen.velikost < argumenti.niti:
+        # Vsaka nit ima med obdelavo zahteve (tudi med pretakanjem odgovora)
+        # prevzeto svojo povezavo, zato povezav ne sme biti manj kot niti.
+        print("Bazen povezav povečan na {} povezav (število niti).".format(argumenti.niti))
+        bazen.velikost = argumenti.niti
+    if argumenti.adapter == 'gunicorn' and argumenti.delavci > 1 and seje.bazen is None:
+        print("Več delavcev si mora deliti seje, zato se seje hranijo v bazi.")
+        seje.bazen = bazen
+    print("Prevedenih predlog:", prevedi_predloge())
+    if argumenti.adapter != 'gunicorn':
+        bazen_gesel.ogrej()
+    moznosti = MOZNOSTI_ADAPTERJA[argumenti.adapter](argumenti.niti, argumenti.delavci)
+    bottle.run(server=argumenti.adapter, host=argumenti.gostitelj,
+               port=argumenti.vrata, reloader=False, **moznosti)
+
+
+if __name__ == '__main__':
+    zazeni()
\ No newline at end of file